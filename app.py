@@ -4,44 +4,79 @@ Soporta: MercadoLibre, Amazon, Liverpool, Walmart, Coppel, Home Depot,
          Elektra, Costco, Sam's Club, Best Buy, Office Depot, y cualquier tienda online
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+from flask_cors.core import try_match_any_pattern
+from asgiref.wsgi import WsgiToAsgi
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
+import abc
+import aiohttp
+import asyncio
+import concurrent.futures
+import hashlib
+import os
+import queue
 import re
+import shutil
+import sqlite3
+import subprocess
+import tempfile
 import json
 from datetime import datetime, timezone
-from urllib.parse import urlparse
+from urllib.parse import urlparse, parse_qs
 import traceback
+import threading
 import time
+import uuid
+
+CORS_ORIGINS = [
+    "https://angelaramiz.github.io",
+    "http://localhost:*",
+    "http://127.0.0.1:*"
+]
 
 app = Flask(__name__)
 CORS(app, resources={
     r"/api/*": {
-        "origins": [
-            "https://angelaramiz.github.io",
-            "http://localhost:*",
-            "http://127.0.0.1:*"
-        ],
+        "origins": CORS_ORIGINS,
         "methods": ["GET", "POST", "OPTIONS"],
         "allow_headers": ["Content-Type"]
     }
 })
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Campos de producto que el cliente puede pedir (proyección con "fields")
+SCRAPE_FIELDS = ['name', 'price', 'image']
+
+# Campos que los meta tags del <head> (og:title, og:image) resuelven sin esperar al render.
+# Si solo se piden estos, el navegador no hace esperas fijas ni lee el HTML completo.
+META_FIELDS = ['name', 'image']
+
+
+def meta_answerable(fields):
+    return set(fields or SCRAPE_FIELDS) <= set(META_FIELDS)
+
 # ============================================
 # CONFIGURACIÓN DE SELENIUM
 # ============================================
-def get_chrome_driver(headless=True):
-    """Crear instancia de Chrome con configuración óptima"""
-    import os
-    
+def get_chrome_driver(headless=True, profile_dir=None):
+    """Crear instancia de Chrome con configuración óptima.
+    Sin `profile_dir` usa un clon de la plantilla de perfil pre-calentada (si está habilitada y lista)."""
     options = Options()
     
+    clone_dir = None
+    if profile_dir is None and PROFILE_TEMPLATE_ENABLED:
+        ensure_profile_template()
+        profile_dir = clone_dir = clone_profile_template()
+    
     if headless:
         options.add_argument('--headless=new')
     
@@ -63,7 +98,7 @@ def get_chrome_driver(headless=True):
     options.add_argument('--metrics-recording-only')
     options.add_argument('--no-first-run')
     options.add_argument('--safebrowsing-disable-auto-update')
-    options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    options.add_argument(f'--user-agent={USER_AGENT}')
     options.add_argument('--lang=es-MX')
     
     # Excluir switches de automatización
@@ -73,8 +108,13 @@ def get_chrome_driver(headless=True):
     # Preferencias para rendimiento
     prefs = {
         'profile.managed_default_content_settings.images': 2,  # No cargar imágenes
-        'disk-cache-size': 4096
     }
+    if profile_dir:
+        # Perfil persistente: cache HTTP con tamaño real y cookies de consentimiento ya aceptadas
+        options.add_argument(f'--user-data-dir={profile_dir}')
+        options.add_argument(f'--disk-cache-size={PROFILE_CACHE_SIZE}')
+    else:
+        prefs['disk-cache-size'] = 4096
     options.add_experimental_option('prefs', prefs)
     
     # Usar chromedriver del sistema si existe (producción), sino usar webdriver-manager (desarrollo)
@@ -91,12 +131,208 @@ def get_chrome_driver(headless=True):
         driver = webdriver.Chrome(service=service, options=options)
         driver.set_page_load_timeout(30)  # Timeout de 30 segundos para cargar página
         driver.set_script_timeout(10)  # Timeout de scripts
+        driver.profile_clone_dir = clone_dir  # quit_driver() lo borra al cerrar
         return driver
     except Exception as e:
         print(f"[ERROR] Failed to create Chrome driver: {str(e)}")
+        if clone_dir:
+            shutil.rmtree(clone_dir, ignore_errors=True)
         raise
 
 
+def quit_driver(driver):
+    """Cerrar Chrome y borrar el clon de perfil de la sesión (si lo tiene)"""
+    try:
+        driver.quit()
+    finally:
+        clone_dir = getattr(driver, 'profile_clone_dir', None)
+        if clone_dir:
+            shutil.rmtree(clone_dir, ignore_errors=True)
+
+
+# ============================================
+# PERFIL DE NAVEGADOR PRE-CALENTADO
+# ============================================
+# Una plantilla de perfil con cache HTTP persistente (bundles JS/CSS de cada tienda) y
+# banners de cookies ya aceptados. Cada sesión usa un clon (copy-on-write con reflink
+# cuando el sistema de archivos lo soporta) y la plantilla se reconstruye periódicamente.
+# Cada reconstrucción es una versión inmutable en PROFILE_TEMPLATE_DIR/versions/ y el symlink
+# PROFILE_TEMPLATE_DIR/current se cambia de forma atómica: los clones no necesitan lock.
+PROFILE_TEMPLATE_ENABLED = os.environ.get('PROFILE_TEMPLATE', '1') != '0'
+PROFILE_TEMPLATE_DIR = os.environ.get('PROFILE_TEMPLATE_DIR',
+                                      os.path.join(tempfile.gettempdir(), 'scraper-profile-template'))
+PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_MB', 64)) * 1024 * 1024
+PROFILE_REFRESH_SECONDS = float(os.environ.get('PROFILE_REFRESH_HOURS', 12)) * 3600
+
+# Páginas que se visitan para calentar la cache y aceptar los avisos de cookies
+PROFILE_WARMUP_URLS = [url for url in os.environ.get('PROFILE_WARMUP_URLS', ','.join([
+    'https://www.mercadolibre.com.mx/',
+    'https://www.amazon.com.mx/',
+    'https://www.liverpool.com.mx/',
+    'https://www.walmart.com.mx/',
+    'https://www.coppel.com/',
+])).split(',') if url]
+
+# Botones de "Aceptar cookies" (OneTrust, Didomi, Amazon, MercadoLibre y genéricos)
+CONSENT_SELECTORS = [
+    '#onetrust-accept-btn-handler',
+    '#didomi-notice-agree-button',
+    '#sp-cc-accept',
+    'button[data-testid="action:understood-button"]',
+    'button[id*="accept"]',
+    'button[class*="accept"]',
+]
+
+# Archivos de bloqueo de Chrome que no deben copiarse a los clones
+PROFILE_LOCK_FILES = ['SingletonLock', 'SingletonCookie', 'SingletonSocket', 'lockfile']
+
+# Versiones que se conservan: la actual y la anterior (un clon en curso puede seguir copiándola)
+PROFILE_KEEP_VERSIONS = 2
+
+_profile_lock = threading.Lock()
+_profile_refreshing = False
+
+
+def profile_versions_dir():
+    return os.path.join(PROFILE_TEMPLATE_DIR, 'versions')
+
+
+def current_profile_template():
+    """Directorio de la versión publicada de la plantilla; None si todavía no hay"""
+    path = os.path.realpath(os.path.join(PROFILE_TEMPLATE_DIR, 'current'))
+    return path if os.path.isfile(os.path.join(path, '.built_at')) else None
+
+
+def profile_template_age():
+    """Segundos desde que se construyó la plantilla; None si no existe"""
+    template = current_profile_template()
+    if not template:
+        return None
+    try:
+        with open(os.path.join(template, '.built_at')) as f:
+            return time.time() - float(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def accept_consent(driver):
+    """Aceptar el aviso de cookies si aparece, para que quede guardado en el perfil"""
+    for selector in CONSENT_SELECTORS:
+        try:
+            buttons = driver.find_elements(By.CSS_SELECTOR, selector)
+            if buttons and buttons[0].is_displayed():
+                buttons[0].click()
+                time.sleep(0.5)
+                return True
+        except:
+            pass
+    return False
+
+
+def build_profile_template(urls=None):
+    """Calentar un perfil nuevo visitando las tiendas y publicarlo como plantilla"""
+    os.makedirs(profile_versions_dir(), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=profile_versions_dir())
+    print(f"[PROFILE] Construyendo plantilla de perfil en {staging}")
+
+    try:
+        driver = get_chrome_driver(headless=True, profile_dir=staging)
+        try:
+            for url in urls or PROFILE_WARMUP_URLS:
+                # Las visitas de calentamiento también esperan su turno en el rate limiter del dominio
+                domain = get_domain(url)
+                if not run_async(rate_limiter.acquire(domain)):
+                    print(f"[PROFILE] Sin turno en el rate limiter para {domain}, se omite {url}")
+                    continue
+                try:
+                    driver.get(url)
+                    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+                    consent = accept_consent(driver)
+                    time.sleep(2)  # Dejar terminar las descargas de JS/CSS
+                    print(f"[PROFILE] Calentado: {url} | Cookies aceptadas: {'✓' if consent else '✗'}")
+                except Exception as e:
+                    print(f"[PROFILE] No se pudo calentar {url}: {str(e)}")
+        finally:
+            driver.quit()
+
+        publish_profile_template(staging)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def publish_profile_template(staging):
+    """Convertir un perfil calentado (dentro de versions/) en la versión actual de la plantilla.
+    La versión queda inmutable; `current` se reemplaza con un rename atómico del symlink."""
+    for name in PROFILE_LOCK_FILES:
+        path = os.path.join(staging, name)
+        if os.path.lexists(path):
+            os.remove(path)
+    with open(os.path.join(staging, '.built_at'), 'w') as f:
+        f.write(str(time.time()))
+
+    version = f"{time.time_ns():020d}-{uuid.uuid4().hex[:6]}"  # Ordenable por fecha de publicación
+    os.rename(staging, os.path.join(profile_versions_dir(), version))
+
+    pointer = os.path.join(PROFILE_TEMPLATE_DIR, f".current-{uuid.uuid4().hex}")
+    os.symlink(os.path.join('versions', version), pointer)
+    os.replace(pointer, os.path.join(PROFILE_TEMPLATE_DIR, 'current'))
+    print(f"[PROFILE] Plantilla de perfil lista (versión {version})")
+
+    # Las versiones más viejas que la anterior ya no las lee ningún clon
+    versions = sorted(name for name in os.listdir(profile_versions_dir()) if not name.startswith('.'))
+    for name in versions[:-PROFILE_KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(profile_versions_dir(), name), ignore_errors=True)
+    return version
+
+
+def ensure_profile_template():
+    """Reconstruir la plantilla en segundo plano si no existe o ya venció (no bloquea el scrape).
+    La reconstrucción corre en el pool de navegadores, así que cuenta dentro de MAX_BROWSERS."""
+    global _profile_refreshing
+    age = profile_template_age()
+    if age is not None and age < PROFILE_REFRESH_SECONDS:
+        return
+
+    with _profile_lock:
+        if _profile_refreshing:
+            return
+        _profile_refreshing = True
+
+    def refresh():
+        global _profile_refreshing
+        try:
+            build_profile_template()
+        except Exception as e:
+            print(f"[PROFILE] Error construyendo la plantilla: {str(e)}")
+        finally:
+            _profile_refreshing = False
+
+    browser_executor.submit(refresh)
+
+
+def clone_profile_template():
+    """Clonar la plantilla para una sesión; None si todavía no hay plantilla.
+    Copia la versión publicada, que nunca cambia, así que no toma ningún lock."""
+    template = current_profile_template()
+    if not template:
+        return None
+
+    clone = tempfile.mkdtemp(prefix='scraper-profile-')
+    try:
+        try:
+            # --reflink=auto: copy-on-write en btrfs/xfs, copia normal en otros FS
+            subprocess.run(['cp', '-a', '--reflink=auto', os.path.join(template, '.'), clone],
+                           check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError):
+            shutil.copytree(template, clone, dirs_exist_ok=True)
+        return clone
+    except Exception as e:
+        print(f"[PROFILE] No se pudo clonar la plantilla: {str(e)}")
+        shutil.rmtree(clone, ignore_errors=True)
+        return None
+
+
 # ============================================
 # DETECTAR PLATAFORMA Y TIENDA
 # ============================================
@@ -213,6 +449,435 @@ def detect_platform(url):
     return 'generic', {'currency': 'MXN', 'store': store_name}
 
 
+def get_domain(url):
+    """Dominio normalizado (sin www.) usado como llave de rate limiting"""
+    try:
+        return urlparse(url).netloc.lower().replace('www.', '') or 'desconocido'
+    except:
+        return 'desconocido'
+
+
+# ============================================
+# CACHE COMPARTIDA Y COORDINACIÓN ENTRE MÁQUINAS
+# ============================================
+# CACHE_URL elige el backend:
+#   redis://... / rediss://...  -> Redis (compartido entre máquinas de Fly)
+#   sqlite:///ruta/cache.db     -> SQLite (un nodo, varios procesos)
+#   memory://                   -> En proceso (por defecto, pruebas)
+CACHE_URL = os.environ.get('CACHE_URL', os.environ.get('REDIS_URL', 'memory://'))
+
+
+class SharedStore(abc.ABC):
+    """Interfaz del backend compartido: valores con TTL y locks con dueño"""
+
+    SWEEP_EVERY = 500  # Cada cuántas escrituras se purgan las llaves vencidas (backends sin TTL nativo)
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Valor vigente de la llave o None"""
+
+    @abc.abstractmethod
+    def set(self, key, value, ttl):
+        """Guardar el valor durante `ttl` segundos"""
+
+    @abc.abstractmethod
+    def acquire_lock(self, key, ttl):
+        """Tomar el lock si está libre; devuelve un token o None"""
+
+    @abc.abstractmethod
+    def release_lock(self, key, token):
+        """Liberar el lock solo si sigue siendo nuestro"""
+
+    def get_json(self, key):
+        value = self.get(key)
+        return json.loads(value) if value else None
+
+    def set_json(self, key, value, ttl):
+        self.set(key, json.dumps(value, ensure_ascii=False), ttl)
+
+
+class MemoryStore(SharedStore):
+    """Backend en proceso (un solo worker)"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _get(self, key):
+        item = self._data.get(key)
+        if item and item[1] <= time.time():
+            del self._data[key]
+            return None
+        return item[0] if item else None
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            now = time.time()
+            self._data[key] = (value, now + ttl)
+            self._writes += 1
+            if self._writes % self.SWEEP_EVERY == 0:
+                self._data = {k: item for k, item in self._data.items() if item[1] > now}
+
+    def acquire_lock(self, key, ttl):
+        token = uuid.uuid4().hex
+        with self._lock:
+            if self._get(key) is not None:
+                return None
+            self._data[key] = (token, time.time() + ttl)
+            return token
+
+    def release_lock(self, key, token):
+        with self._lock:
+            if self._get(key) == token:
+                del self._data[key]
+
+
+class SQLiteStore(SharedStore):
+    """Backend SQLite: comparte estado entre procesos del mismo nodo"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, expires REAL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS kv_expires ON kv (expires)')
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM kv WHERE key = ? AND expires > ?', (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            now = time.time()
+            self._conn.execute('INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)',
+                               (key, value, now + ttl))
+            self._writes += 1
+            if self._writes % self.SWEEP_EVERY == 0:
+                self._conn.execute('DELETE FROM kv WHERE expires <= ?', (now,))
+
+    def acquire_lock(self, key, ttl):
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute('DELETE FROM kv WHERE key = ? AND expires <= ?', (key, now))
+                cursor = self._conn.execute('INSERT OR IGNORE INTO kv (key, value, expires) VALUES (?, ?, ?)',
+                                            (key, token, now + ttl))
+                self._conn.execute('COMMIT')
+            except:
+                self._conn.execute('ROLLBACK')
+                raise
+        return token if cursor.rowcount == 1 else None
+
+    def release_lock(self, key, token):
+        with self._lock:
+            self._conn.execute('DELETE FROM kv WHERE key = ? AND value = ?', (key, token))
+
+
+class RedisStore(SharedStore):
+    """Backend Redis (o cualquier servidor compatible con el protocolo: Upstash, KeyDB, Dragonfly)"""
+
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url, decode_responses=True, socket_timeout=2, socket_connect_timeout=2)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, ex=max(int(ttl), 1))
+
+    def acquire_lock(self, key, ttl):
+        token = uuid.uuid4().hex
+        if self._client.set(key, token, nx=True, px=int(ttl * 1000)):
+            return token
+        return None
+
+    def release_lock(self, key, token):
+        self._client.eval(self.RELEASE_SCRIPT, 1, key, token)
+
+
+def create_store(url):
+    """Crear el backend compartido a partir de CACHE_URL"""
+    if url.startswith(('redis://', 'rediss://')):
+        print("[CACHE] Backend: Redis")
+        return RedisStore(url)
+    if url.startswith('sqlite:///'):
+        print(f"[CACHE] Backend: SQLite ({url[len('sqlite:///'):]})")
+        return SQLiteStore(url[len('sqlite:///'):])
+    return MemoryStore()
+
+
+shared_store = create_store(CACHE_URL)
+
+
+# ============================================
+# RATE LIMITING POR DOMINIO (TOKEN BUCKET ADAPTATIVO)
+# ============================================
+RATE_LIMIT_RPS = float(os.environ.get('RATE_LIMIT_RPS', 0.5))  # Peticiones/seg por dominio
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', 2))
+RATE_LIMIT_MIN_RPS = float(os.environ.get('RATE_LIMIT_MIN_RPS', 0.02))
+RATE_LIMIT_MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', 120))  # Máximo en cola (seg)
+RATE_LIMIT_MAX_BACKOFF = float(os.environ.get('RATE_LIMIT_MAX_BACKOFF', 300))
+
+
+class DomainRateLimiter:
+    """Token bucket por dominio con backoff adaptativo (AIMD)
+
+    - CAPTCHA: reduce la tasa a la mitad y pausa el dominio con backoff exponencial
+    - Error: reduce la tasa un 20%
+    - Éxito: recupera la tasa gradualmente y reinicia el backoff
+    Las peticiones esperan en cola su turno en lugar de fallar.
+    """
+
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, rate=RATE_LIMIT_RPS, burst=RATE_LIMIT_BURST, min_rate=RATE_LIMIT_MIN_RPS,
+                 max_wait=RATE_LIMIT_MAX_WAIT, max_backoff=RATE_LIMIT_MAX_BACKOFF):
+        self.base_rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_wait = max_wait
+        self.max_backoff = max_backoff
+        self._domains = {}
+        self._lock = threading.Lock()
+
+    def _state(self, domain):
+        state = self._domains.get(domain)
+        if state is None:
+            state = {
+                'rate': self.base_rate,
+                'tokens': self.burst,
+                'updated': time.monotonic(),
+                'backoff': 0.0,
+                'backoff_until': 0.0,
+                'captcha_rate': 0.0,
+                'error_rate': 0.0,
+                'requests': 0,
+                'captchas': 0,
+                'errors': 0,
+                'queued': 0
+            }
+            self._domains[domain] = state
+        return state
+
+    def _refill(self, state, now):
+        elapsed = now - state['updated']
+        state['tokens'] = min(self.burst, state['tokens'] + elapsed * state['rate'])
+        state['updated'] = now
+
+    def _take(self, state, now):
+        """Tomar un token si hay; si no, devolver los segundos que faltan para el siguiente"""
+        self._refill(state, now)
+        if now >= state['backoff_until'] and state['tokens'] >= 1:
+            state['tokens'] -= 1
+            return 0
+        return max(state['backoff_until'] - now, (1 - state['tokens']) / state['rate'], 0.01)
+
+    async def acquire(self, domain, max_wait=None):
+        """Esperar en cola (sin bloquear el event loop) hasta obtener un token;
+        False si se excede la espera máxima"""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+
+        with self._lock:
+            state = self._state(domain)
+            state['queued'] += 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    wait = self._take(state, now)
+                if not wait:
+                    return True
+                if now + wait > deadline:
+                    return False
+                await asyncio.sleep(wait)
+        finally:
+            with self._lock:
+                state['queued'] -= 1
+
+    def record(self, domain, outcome):
+        """Registrar el resultado ('ok', 'captcha' o 'error') y ajustar la tasa del dominio"""
+        with self._lock:
+            state = self._state(domain)
+            now = time.monotonic()
+            self._refill(state, now)
+
+            is_captcha = 1.0 if outcome == 'captcha' else 0.0
+            is_error = 1.0 if outcome == 'error' else 0.0
+            state['requests'] += 1
+            state['captchas'] += int(is_captcha)
+            state['errors'] += int(is_error)
+            state['captcha_rate'] += self.EWMA_ALPHA * (is_captcha - state['captcha_rate'])
+            state['error_rate'] += self.EWMA_ALPHA * (is_error - state['error_rate'])
+
+            if outcome == 'captcha':
+                state['rate'] = max(self.min_rate, state['rate'] / 2)
+                state['backoff'] = min(self.max_backoff, max(state['backoff'] * 2, 1 / self.base_rate))
+                state['backoff_until'] = now + state['backoff']
+                state['tokens'] = 0
+            elif outcome == 'error':
+                state['rate'] = max(self.min_rate, state['rate'] * 0.8)
+            else:
+                state['rate'] = min(self.base_rate, state['rate'] + self.base_rate * 0.1)
+                state['backoff'] = 0.0
+
+    def export_state(self, domain):
+        """Estado adaptativo del dominio para compartirlo con otras máquinas (reloj de pared)"""
+        with self._lock:
+            state = self._state(domain)
+            return {
+                'rate': state['rate'],
+                'backoff': state['backoff'],
+                'backoff_until': time.time() + max(state['backoff_until'] - time.monotonic(), 0)
+            }
+
+    def merge_state(self, domain, shared):
+        """Adoptar el estado compartido si es más estricto que el local"""
+        if not shared:
+            return
+        with self._lock:
+            state = self._state(domain)
+            now = time.monotonic()
+            state['rate'] = max(self.min_rate, min(state['rate'], shared.get('rate', state['rate'])))
+            state['backoff'] = max(state['backoff'], shared.get('backoff', 0))
+            remote_until = now + shared.get('backoff_until', 0) - time.time()
+            state['backoff_until'] = max(state['backoff_until'], remote_until)
+
+    def snapshot(self):
+        """Estado actual de cada dominio para el endpoint de monitoreo"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                domain: {
+                    'rate': round(state['rate'], 4),
+                    'baseRate': self.base_rate,
+                    'tokens': round(min(self.burst, state['tokens'] + (now - state['updated']) * state['rate']), 2),
+                    'backoffSeconds': round(state['backoff'], 2),
+                    'backoffRemaining': round(max(state['backoff_until'] - now, 0), 2),
+                    'captchaRate': round(state['captcha_rate'], 4),
+                    'errorRate': round(state['error_rate'], 4),
+                    'requests': state['requests'],
+                    'captchas': state['captchas'],
+                    'errors': state['errors'],
+                    'queued': state['queued']
+                }
+                for domain, state in self._domains.items()
+            }
+
+
+rate_limiter = DomainRateLimiter()
+
+
+# ============================================
+# DETECCIÓN DE CAPTCHA / PÁGINAS DE BLOQUEO
+# ============================================
+class BlockedPageError(Exception):
+    """La tienda respondió con un CAPTCHA o una página de bloqueo anti-bot"""
+
+    def __init__(self, platform, kind, signal):
+        self.platform = platform
+        self.kind = kind  # 'captcha' o 'block'
+        self.signal = signal
+        super().__init__(f"{platform}: {kind} detectado ({signal})")
+
+    @property
+    def code(self):
+        return 'CAPTCHA_DETECTADO' if self.kind == 'captcha' else 'BLOQUEO_DETECTADO'
+
+
+BLOCK_STATUS_CODES = [403, 429, 503]
+
+# Firmas comunes a cualquier tienda (Cloudflare, Akamai, PerimeterX, reCAPTCHA...)
+COMMON_BLOCK_SIGNATURES = {
+    'captcha_titles': ['robot check', 'are you a robot', 'verify you are human', 'captcha', 'eres un robot'],
+    'block_titles': ['access denied', 'attention required', 'just a moment', 'pardon our interruption',
+                     'acceso denegado', 'security check'],
+    # Solo marcadores de páginas de desafío: los widgets de reCAPTCHA/hCaptcha también aparecen en
+    # páginas normales (login, newsletter, reCAPTCHA v3 invisible) y darían falsos positivos
+    'captcha_selectors': ['#px-captcha', '#challenge-form', '#cf-challenge-running'],
+}
+
+# Firmas específicas por plataforma (se suman a las comunes)
+BLOCK_SIGNATURES = {
+    'amazon': {
+        'captcha_titles': ['amazon.com.mx: captcha', 'amazon.com: captcha'],
+        'captcha_selectors': ['form[action*="validateCaptcha"]', '#captchacharacters'],
+    },
+    'mercadolibre': {
+        'captcha_selectors': ['form[action*="captcha"]'],
+    },
+    'walmart': {
+        'block_titles': ['robot or human'],
+    },
+}
+
+
+def get_block_signatures(platform_name):
+    """Combinar firmas comunes con las de la plataforma"""
+    specific = BLOCK_SIGNATURES.get(platform_name, {})
+    return {
+        key: COMMON_BLOCK_SIGNATURES.get(key, []) + specific.get(key, [])
+        for key in ['captcha_titles', 'block_titles', 'captcha_selectors']
+    }
+
+
+def check_block_signals(platform_name, title, status):
+    """Señales baratas comunes al navegador y al HTML crudo: título de la página y código HTTP"""
+    signatures = get_block_signatures(platform_name)
+    title = (title or '').lower()
+
+    for text in signatures['captcha_titles']:
+        if text in title:
+            raise BlockedPageError(platform_name, 'captcha', f'title: {text}')
+    for text in signatures['block_titles']:
+        if text in title:
+            raise BlockedPageError(platform_name, 'block', f'title: {text}')
+
+    if status in BLOCK_STATUS_CODES:
+        raise BlockedPageError(platform_name, 'captcha' if status == 429 else 'block', f'status: {status}')
+
+
+def check_blocked(driver, url):
+    """Revisar justo después de navegar si la página es un CAPTCHA/bloqueo.
+    Usa señales baratas (título, código HTTP y una sola consulta al DOM) y lanza
+    BlockedPageError para abortar antes de correr las estrategias de extracción."""
+    platform_name, _ = detect_platform(url)
+    signatures = get_block_signatures(platform_name)
+
+    try:
+        title = driver.title
+    except:
+        title = ''
+
+    try:
+        status = driver.execute_script(
+            "var nav = performance.getEntriesByType('navigation')[0];"
+            "return nav && nav.responseStatus ? nav.responseStatus : 0;"
+        )
+    except:
+        status = 0
+    check_block_signals(platform_name, title, status)
+
+    try:
+        probe = driver.find_elements(By.CSS_SELECTOR, ', '.join(signatures['captcha_selectors']))
+    except:
+        probe = []
+    if probe:
+        raise BlockedPageError(platform_name, 'captcha', 'dom probe')
+
+
 # ============================================
 # UTILIDADES PARA EXTRACCIÓN DE PRECIOS
 # ============================================
@@ -266,11 +931,435 @@ def extract_price_from_text(text):
     return clean_price(text)
 
 
+# ============================================
+# NÚCLEO ASÍNCRONO (asyncio)
+# ============================================
+# Las peticiones HTTP y las esperas del rate limiter corren como corrutinas en un
+# único event loop de fondo; Selenium (bloqueante) corre en un pool acotado de hilos.
+MAX_BROWSERS = int(os.environ.get('MAX_BROWSERS', 2))
+SCRAPE_TIMEOUT = float(os.environ.get('SCRAPE_TIMEOUT', 180))
+STRUCTURED_TIMEOUT = float(os.environ.get('STRUCTURED_TIMEOUT', 5))
+
+browser_executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_BROWSERS, thread_name_prefix='browser')
+_loop = None
+_loop_lock = threading.Lock()
+_http_session = None
+
+
+def get_event_loop():
+    """Event loop compartido; se crea la primera vez en un hilo daemon"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='scrape-loop', daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def run_async(coro, timeout=SCRAPE_TIMEOUT):
+    """Adaptador para las rutas Flask: ejecutar una corrutina en el loop compartido y esperar el resultado"""
+    future = asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+
+async def await_core(coro):
+    """Adaptador para las rutas ASGI: esperar una corrutina del loop compartido sin ocupar un hilo"""
+    loop = get_event_loop()
+    if loop is asyncio.get_running_loop():
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+async def run_in_browser(fn, *args):
+    """Ejecutar una función de Selenium en el pool de navegadores sin bloquear el loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(browser_executor, fn, *args)
+
+
+def get_http_session():
+    """Sesión aiohttp compartida (solo se usa desde el hilo del event loop)"""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            headers={'User-Agent': USER_AGENT, 'Accept-Language': 'es-MX,es;q=0.9'},
+            timeout=aiohttp.ClientTimeout(total=STRUCTURED_TIMEOUT)
+        )
+    return _http_session
+
+
+async def fetch_json(url):
+    """Descargar y parsear un recurso JSON sin abrir el navegador"""
+    async with get_http_session().get(url, headers={'Accept': 'application/json'}) as response:
+        response.raise_for_status()
+        return await response.json(content_type=None)
+
+
+async def fetch_html(url):
+    """Descargar el HTML crudo de una página; devuelve (status, html)"""
+    async with get_http_session().get(url, headers={'Accept': 'text/html'}) as response:
+        return response.status, await response.text(errors='replace')
+
+
+# ============================================
+# PROGRESO EN STREAMING Y CANCELACIÓN
+# ============================================
+class ScrapeCancelled(Exception):
+    """El cliente cerró el stream; las estrategias restantes no se ejecutan"""
+
+
+class ScrapeProgress:
+    """Canal de eventos de un scrape en streaming (un evento por campo encontrado).
+    Los hilos del navegador publican en una cola que consume la ruta: una queue.Queue para
+    Flask o, con `loop`, una asyncio.Queue de ese loop para la ruta ASGI.
+    cancel() marca la cancelación y cierra el driver de inmediato."""
+
+    def __init__(self, fields=None, loop=None):
+        self.fields = fields or SCRAPE_FIELDS
+        self._events_loop = loop
+        self.events = asyncio.Queue() if loop else queue.Queue()
+        self.cancelled = threading.Event()
+        self._sent = {}
+        self._driver = None
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        if self._events_loop:
+            self._events_loop.call_soon_threadsafe(self.events.put_nowait, event)
+        else:
+            self.events.put(event)
+
+    def report(self, result, source, provisional=True):
+        """Publicar los campos nuevos o cambiados del resultado parcial"""
+        for field in self.fields:
+            value = result.get(field)
+            if value and self._sent.get(field) != value:
+                self._sent[field] = value
+                self.emit({
+                    'event': 'field',
+                    'field': field,
+                    'value': value,
+                    'source': source,
+                    'provisional': provisional
+                })
+        self.check()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise ScrapeCancelled()
+
+    def attach_driver(self, driver):
+        with self._lock:
+            self._driver = driver
+        if self.cancelled.is_set():
+            self.cancel()
+
+    def detach_driver(self):
+        """Soltar el driver; True si sigue abierto y el llamador debe cerrarlo"""
+        with self._lock:
+            driver, self._driver = self._driver, None
+        return driver is not None
+
+    def cancel(self):
+        self.cancelled.set()
+        with self._lock:
+            driver, self._driver = self._driver, None
+        if driver:
+            print("[STREAM] Cancelado por el cliente, cerrando navegador")
+            try:
+                quit_driver(driver)
+            except:
+                pass
+
+
+# ============================================
+# EXTRACCIÓN ESTRUCTURADA (APIs Y ESTADO EMBEBIDO)
+# ============================================
+# Base de la API pública de MercadoLibre (configurable para apuntar al stub local)
+MELI_API_BASE = os.environ.get('MELI_API_BASE', 'https://api.mercadolibre.com')
+
+# Rutas conocidas del producto principal (Next.js y tiendas VTEX/React)
+STATE_PRODUCT_PATHS = [
+    ['props', 'pageProps', 'product'],
+    ['props', 'pageProps', 'initialState', 'product'],
+    ['props', 'pageProps', 'data', 'product'],
+    ['pdp', 'item'],
+    ['product'],
+]
+
+STATE_ID_KEYS = ['sku', 'skuId', 'productId', 'itemId', 'id']
+STATE_NAME_KEYS = ['name', 'title', 'productName', 'displayName']
+STATE_PRICE_KEYS = ['price', 'salePrice', 'currentPrice', 'offerPrice', 'finalPrice', 'sellingPrice']
+STATE_LIST_PRICE_KEYS = ['listPrice']  # Precio de lista: solo si no hay precio de venta
+STATE_IMAGE_KEYS = ['image', 'imageUrl', 'images', 'thumbnail', 'pictures', 'mainImage']
+STATE_CURRENCY_KEYS = ['currency', 'currencyCode', 'currency_id', 'priceCurrency']
+
+
+def extract_mercadolibre_item_id(url):
+    """Obtener el ID de publicación (ej. MLM123456789) desde una URL de MercadoLibre"""
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    for key in ['item_id', 'wid']:
+        if query.get(key):
+            match = re.match(r'^(ML[A-Z])-?(\d+)$', query[key][0], re.IGNORECASE)
+            if match:
+                return f"{match.group(1).upper()}{match.group(2)}"
+
+    # Las URLs de catálogo (/p/MLM...) son productos, no publicaciones
+    match = re.search(r'(?<!/p/)\b(ML[A-Z])-?(\d{6,})', parsed.path, re.IGNORECASE)
+    if match:
+        return f"{match.group(1).upper()}{match.group(2)}"
+    return None
+
+
+async def fetch_mercadolibre_api(url, platform_config):
+    """Resolver una publicación de MercadoLibre mediante su API pública de items"""
+    item_id = extract_mercadolibre_item_id(url)
+    if not item_id:
+        return None
+
+    print(f"[API] MercadoLibre item: {item_id}")
+    data = await fetch_json(f"{MELI_API_BASE}/items/{item_id}")
+
+    image = ''
+    pictures = data.get('pictures') or []
+    if pictures:
+        image = pictures[0].get('secure_url') or pictures[0].get('url') or ''
+    if not image:
+        image = data.get('secure_thumbnail') or data.get('thumbnail') or ''
+
+    return {
+        'name': (data.get('title') or '').strip(),
+        'price': clean_price(data.get('price')),
+        'image': image,
+        'currency': data.get('currency_id') or platform_config.get('currency', 'MXN'),
+        'store': platform_config.get('store', 'MercadoLibre')
+    }
+
+
+# Plataformas con API oficial/pública que evita renderizar la página
+STRUCTURED_APIS = {
+    'mercadolibre': fetch_mercadolibre_api,
+}
+
+
+def has_fields(result, fields):
+    """True si el resultado ya tiene todos los campos pedidos"""
+    return all(result.get(field) for field in fields)
+
+
+def required_fields(fields):
+    """Campos que debe traer un resultado para darlo por bueno sin navegador.
+    La imagen es opcional salvo que sea lo único que se pidió."""
+    return [f for f in (fields or SCRAPE_FIELDS) if f != 'image'] or ['image']
+
+
+async def fetch_structured_product(url, platform_name, platform_config, fields=None):
+    """Intentar obtener el producto desde fuentes estructuradas (API, estado embebido) antes de usar Selenium"""
+    required = required_fields(fields)
+
+    fetchers = []
+    if platform_name in STRUCTURED_APIS:
+        fetchers.append(STRUCTURED_APIS[platform_name])
+    if platform_name not in HTTP_STATE_SKIP:
+        # Evitar pedir dos veces la página a tiendas que ya mostraron no tener estado embebido
+        if await store_call(shared_store.get, 'httpstate:' + get_domain(url)) != 'no':
+            fetchers.append(fetch_embedded_state_product)
+
+    for fetcher in fetchers:
+        try:
+            result = await fetcher(url, platform_config)
+        except Exception as e:
+            print(f"[API] Falló {fetcher.__name__} ({platform_name}): {str(e)}")
+            continue
+
+        if result and has_fields(result, required):
+            print(f"[API] Resultado: {result['name'][:50]}... | ${result['price']}")
+            return result
+    return None
+
+
+def extract_embedded_state(html):
+    """Extraer los blobs de estado JSON (__NEXT_DATA__, __PRELOADED_STATE__) del HTML"""
+    states = []
+    if not html:
+        return states
+
+    match = re.search(r'<script[^>]*id=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', html, re.DOTALL)
+    if match:
+        try:
+            states.append(json.loads(match.group(1)))
+        except ValueError:
+            pass
+
+    decoder = json.JSONDecoder()
+    for var_name in ['__PRELOADED_STATE__', '__INITIAL_STATE__']:
+        match = re.search(r'window\.' + var_name + r'\s*=\s*', html)
+        if not match:
+            continue
+        try:
+            state, _ = decoder.raw_decode(html, match.end())
+            states.append(state)
+        except ValueError:
+            pass
+
+    return states
+
+
+def _state_value(node, keys):
+    for key in keys:
+        if node.get(key) not in (None, '', [], {}):
+            return node[key]
+    return None
+
+
+def _state_price(value):
+    if isinstance(value, dict):
+        value = _state_value(value, ['amount', 'value', 'price', 'current', 'sale'])
+    if isinstance(value, (dict, list)) or value is None:
+        return 0
+    return clean_price(value)
+
+
+def _state_image(value):
+    if isinstance(value, list):
+        value = value[0] if value else ''
+    if isinstance(value, dict):
+        value = _state_value(value, ['secure_url', 'url', 'src', 'href']) or ''
+    if isinstance(value, str) and value.startswith('//'):
+        value = 'https:' + value
+    return value if isinstance(value, str) and value.startswith('http') else ''
+
+
+def _state_product(node):
+    """Producto (nombre + precio) de un nodo del estado; el precio de lista solo como último recurso"""
+    name = _state_value(node, STATE_NAME_KEYS)
+    if not isinstance(name, str) or not name.strip():
+        return None
+
+    price = _state_price(_state_value(node, STATE_PRICE_KEYS))
+    list_price = price <= 0
+    if list_price:
+        price = _state_price(_state_value(node, STATE_LIST_PRICE_KEYS))
+    if price <= 0:
+        return None
+
+    currency = _state_value(node, STATE_CURRENCY_KEYS)
+    return {
+        'name': name.strip(),
+        'price': price,
+        'image': _state_image(_state_value(node, STATE_IMAGE_KEYS)),
+        'currency': currency if isinstance(currency, str) else '',
+        'list_price': list_price
+    }
+
+
+def _state_path(state, path):
+    node = state
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node if isinstance(node, dict) else None
+
+
+def find_product_in_state(state, max_nodes=20000, known_paths_only=False):
+    """Buscar el producto principal en el estado embebido.
+    Primero las rutas conocidas; si no (y `known_paths_only` es False), el primer objeto con
+    identificador (sku, id...), nombre y precio de venta. Breadcrumbs y carruseles sin
+    identificador se ignoran."""
+    for path in STATE_PRODUCT_PATHS:
+        node = _state_path(state, path)
+        product = _state_product(node) if node else None
+        if product:
+            product.pop('list_price')
+            return product
+    if known_paths_only:
+        return None
+
+    fallback = None
+    stack = [state]
+    visited = 0
+
+    while stack and visited < max_nodes:
+        node = stack.pop()
+        visited += 1
+
+        if isinstance(node, dict):
+            product = _state_product(node) if _state_value(node, STATE_ID_KEYS) is not None else None
+            if product and not product['list_price']:
+                product.pop('list_price')
+                return product
+            if product and not fallback:
+                fallback = product
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+    if fallback:
+        fallback.pop('list_price')
+    return fallback
+
+
+# ============================================
+# ESTADO EMBEBIDO EN HTML CRUDO (SIN NAVEGADOR)
+# ============================================
+# Plataformas cuyo HTML crudo nunca trae estado embebido útil (se van directo al navegador)
+HTTP_STATE_SKIP = ['amazon']
+
+# Veredicto por dominio ('yes'/'no') sobre si su HTML crudo trae estado embebido. Un dominio sin
+# estado se salta la petición HTTP extra durante este tiempo; uno que alguna vez lo trajo se sigue probando.
+STATE_PROBE_TTL = float(os.environ.get('STATE_PROBE_HOURS', 12)) * 3600
+
+
+async def fetch_embedded_state_product(url, platform_config):
+    """Leer el estado embebido (__NEXT_DATA__, __PRELOADED_STATE__) del HTML crudo, sin navegador.
+    Un CAPTCHA o página de bloqueo en la petición cruda (p. ej. 403 de Akamai a clientes sin JS) no
+    corta el scrape: cuenta como fallo de este nivel y el dominio se marca sin estado para ir a Chrome."""
+    status, html = await fetch_html(url)
+    domain = get_domain(url)
+    state_key = 'httpstate:' + domain
+
+    title = re.search(r'<title[^>]*>(.*?)</title>', html or '', re.IGNORECASE | re.DOTALL)
+    try:
+        check_block_signals(detect_platform(url)[0], title.group(1) if title else '', status)
+    except BlockedPageError as e:
+        print(f"[API] HTML crudo de {domain} bloqueado ({e.kind}: {e.signal}); se usará directo el navegador")
+        await store_call(shared_store.set, state_key, 'no', STATE_PROBE_TTL)
+        return None
+    if status != 200:
+        return None
+
+    for state in extract_embedded_state(html):
+        product = find_product_in_state(state)
+        if product:
+            await store_call(shared_store.set, state_key, 'yes', STATE_PROBE_TTL)
+            return {
+                'name': product['name'],
+                'price': product['price'],
+                'image': product['image'],
+                'currency': product['currency'] or platform_config.get('currency', 'MXN'),
+                'store': platform_config.get('store', 'Tienda Online')
+            }
+
+    if await store_call(shared_store.get, state_key) != 'yes':
+        print(f"[API] {domain} no trae estado embebido; se usará directo el navegador")
+        await store_call(shared_store.set, state_key, 'no', STATE_PROBE_TTL)
+    return None
+
+
 # ============================================
 # EXTRACTOR UNIVERSAL DE DATOS
 # ============================================
-def universal_extract(driver, url, platform_config):
-    """Extractor universal que funciona con cualquier tienda online"""
+def universal_extract(driver, url, platform_config, progress=None, fields=None):
+    """Extractor universal que funciona con cualquier tienda online.
+    Con `fields` solo ejecuta las estrategias y selectores de esos campos y se detiene
+    en cuanto los tiene todos. Si recibe un ScrapeProgress, reporta cada campo apenas
+    una estrategia lo encuentra y se detiene entre estrategias si el cliente canceló."""
     print(f"[UNIVERSAL] Extrayendo datos de: {url}")
     
     result = {
@@ -280,46 +1369,95 @@ def universal_extract(driver, url, platform_config):
         'currency': platform_config.get('currency', 'MXN'),
         'store': platform_config.get('store', 'Tienda Online')
     }
-    
-    time.sleep(1)  # Reducido de 3 a 1 segundo para modo quick
-    
+    fields = fields or SCRAPE_FIELDS
+
+    def needs(field):
+        """El campo fue pedido y todavía no se encontró"""
+        return field in fields and not result[field]
+
+    def pending():
+        return any(needs(field) for field in fields)
+    
+    # Solo nombre/imagen: sin espera fija y meta tags primero; si responden, no se lee page_source
+    meta_first = meta_answerable(fields)
+    if not meta_first:
+        time.sleep(1)  # Reducido de 3 a 1 segundo para modo quick
+    if progress:
+        progress.check()
+
+    def fill_from_state(known_paths_only):
+        """Completar los campos faltantes con el producto del estado embebido"""
+        for state in states:
+            product = find_product_in_state(state, known_paths_only=known_paths_only)
+            if product:
+                for field in SCRAPE_FIELDS:
+                    if needs(field) and product[field]:
+                        result[field] = product[field]
+                if product['currency']:
+                    result['currency'] = product['currency']
+                return
+
+    def fill_from_meta():
+        """Completar los campos faltantes con los meta tags (Open Graph, Twitter, itemprop)"""
+        meta_strategies = [
+            {'name': 'meta[property="og:title"]', 'attr': 'content'},
+            {'name': 'meta[property="og:image"]', 'attr': 'content', 'field': 'image'},
+            {'name': 'meta[property="product:price:amount"]', 'attr': 'content', 'field': 'price'},
+            {'name': 'meta[property="og:price:amount"]', 'attr': 'content', 'field': 'price'},
+            {'name': 'meta[itemprop="price"]', 'attr': 'content', 'field': 'price'},
+            {'name': 'meta[name="twitter:title"]', 'attr': 'content'},
+            {'name': 'meta[name="twitter:image"]', 'attr': 'content', 'field': 'image'},
+            {'name': 'meta[name="title"]', 'attr': 'content'},
+        ]
+        
+        for strategy in meta_strategies:
+            if not needs(strategy.get('field', 'name')):
+                continue
+            try:
+                element = driver.find_element(By.CSS_SELECTOR, strategy['name'])
+                value = element.get_attribute(strategy['attr'])
+                
+                if value:
+                    field = strategy.get('field', 'name')
+                    if field == 'price':
+                        price = clean_price(value)
+                        if price > 0 and result['price'] == 0:
+                            result['price'] = price
+                    elif field == 'image' and not result['image']:
+                        result['image'] = value
+                    elif field == 'name' and not result['name']:
+                        result['name'] = value.strip()
+            except:
+                pass
+        if progress:
+            progress.report(result, 'meta')
+
+    if meta_first:
+        fill_from_meta()
+
+    # ============================================
+    # ESTRATEGIA 0: Estado embebido (__NEXT_DATA__, __PRELOADED_STATE__)
+    # Solo rutas conocidas del producto; la búsqueda heurística corre después de meta tags y JSON-LD
+    # ============================================
+    try:
+        states = extract_embedded_state(driver.page_source if pending() else '')
+    except:
+        states = []
+    fill_from_state(known_paths_only=True)
+    if progress:
+        progress.report(result, 'embedded_state')
+
     # ============================================
     # ESTRATEGIA 1: Meta Tags
     # ============================================
-    meta_strategies = [
-        {'name': 'meta[property="og:title"]', 'attr': 'content'},
-        {'name': 'meta[property="og:image"]', 'attr': 'content', 'field': 'image'},
-        {'name': 'meta[property="product:price:amount"]', 'attr': 'content', 'field': 'price'},
-        {'name': 'meta[property="og:price:amount"]', 'attr': 'content', 'field': 'price'},
-        {'name': 'meta[itemprop="price"]', 'attr': 'content', 'field': 'price'},
-        {'name': 'meta[name="twitter:title"]', 'attr': 'content'},
-        {'name': 'meta[name="twitter:image"]', 'attr': 'content', 'field': 'image'},
-        {'name': 'meta[name="title"]', 'attr': 'content'},
-    ]
-    
-    for strategy in meta_strategies:
-        try:
-            element = driver.find_element(By.CSS_SELECTOR, strategy['name'])
-            value = element.get_attribute(strategy['attr'])
-            
-            if value:
-                field = strategy.get('field', 'name')
-                if field == 'price':
-                    price = clean_price(value)
-                    if price > 0:
-                        result['price'] = price
-                elif field == 'image' and not result['image']:
-                    result['image'] = value
-                elif field == 'name' and not result['name']:
-                    result['name'] = value.strip()
-        except:
-            pass
+    if not meta_first:
+        fill_from_meta()
     
     # ============================================
     # ESTRATEGIA 2: JSON-LD (Schema.org)
     # ============================================
     try:
-        scripts = driver.find_elements(By.CSS_SELECTOR, 'script[type="application/ld+json"]')
+        scripts = driver.find_elements(By.CSS_SELECTOR, 'script[type="application/ld+json"]') if pending() else []
         for script in scripts:
             try:
                 data = json.loads(script.get_attribute('innerHTML'))
@@ -332,6 +1470,14 @@ def universal_extract(driver, url, platform_config):
                 pass
     except:
         pass
+    if progress:
+        progress.report(result, 'jsonld')
+    
+    # Estado embebido sin ruta conocida: primer objeto con identificador, nombre y precio
+    if pending():
+        fill_from_state(known_paths_only=False)
+        if progress:
+            progress.report(result, 'embedded_state')
     
     # ============================================
     # ESTRATEGIA 3: Selectores CSS comunes
@@ -348,7 +1494,7 @@ def universal_extract(driver, url, platform_config):
         'h1'
     ]
     
-    if not result['name']:
+    if needs('name'):
         for selector in name_selectors:
             try:
                 element = driver.find_element(By.CSS_SELECTOR, selector)
@@ -357,6 +1503,8 @@ def universal_extract(driver, url, platform_config):
                     break
             except:
                 pass
+    if progress:
+        progress.report(result, 'css')
     
     # Selectores de PRECIO
     price_selectors = [
@@ -372,7 +1520,7 @@ def universal_extract(driver, url, platform_config):
         'span[class*="price"]', 'div[class*="price"]'
     ]
     
-    if result['price'] == 0:
+    if needs('price'):
         for selector in price_selectors:
             try:
                 elements = driver.find_elements(By.CSS_SELECTOR, selector)
@@ -387,6 +1535,8 @@ def universal_extract(driver, url, platform_config):
                     break
             except:
                 pass
+    if progress:
+        progress.report(result, 'css')
     
     # Selectores de IMAGEN
     image_selectors = [
@@ -398,7 +1548,7 @@ def universal_extract(driver, url, platform_config):
         'img[class*="product"]', 'img[class*="gallery"]'
     ]
     
-    if not result['image']:
+    if needs('image'):
         for selector in image_selectors:
             try:
                 element = driver.find_element(By.CSS_SELECTOR, selector)
@@ -410,11 +1560,13 @@ def universal_extract(driver, url, platform_config):
                     break
             except:
                 pass
+    if progress:
+        progress.report(result, 'css')
     
     # ============================================
     # ESTRATEGIA 4: Buscar en el HTML/JavaScript
     # ============================================
-    if result['price'] == 0:
+    if needs('price'):
         try:
             page_source = driver.page_source
             price_patterns = [
@@ -435,6 +1587,8 @@ def universal_extract(driver, url, platform_config):
                         break
         except:
             pass
+        if progress:
+            progress.report(result, 'html')
     
     # ============================================
     # LIMPIEZA FINAL
@@ -450,7 +1604,7 @@ def universal_extract(driver, url, platform_config):
             result['name'] = result['name'].replace(text, '')
         result['name'] = result['name'].strip()
     
-    if not result['name']:
+    if needs('name'):
         try:
             result['name'] = driver.title.split('|')[0].split('-')[0].strip()
         except:
@@ -498,17 +1652,19 @@ def extract_from_jsonld(data, result):
 # SCRAPERS ESPECÍFICOS POR PLATAFORMA
 # ============================================
 
-def scrape_mercadolibre(driver, url):
+def scrape_mercadolibre(driver, url, progress=None, fields=None):
     """Scraping optimizado para MercadoLibre"""
     print(f"[ML] Scraping: {url}")
     
     driver.get(url)
     WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+    check_blocked(driver, url)
     
     config = {'currency': 'MXN', 'store': 'MercadoLibre'}
-    result = universal_extract(driver, url, config)
+    fields = fields or SCRAPE_FIELDS
+    result = universal_extract(driver, url, config, progress, fields)
     
-    if result['price'] == 0:
+    if 'price' in fields and result['price'] == 0:
         try:
             price_el = driver.find_element(By.CSS_SELECTOR, '.andes-money-amount__fraction')
             if price_el:
@@ -519,23 +1675,19 @@ def scrape_mercadolibre(driver, url):
     return result
 
 
-def scrape_amazon(driver, url):
+def scrape_amazon(driver, url, progress=None, fields=None):
     """Scraping optimizado para Amazon"""
     print(f"[AMZ] Scraping: {url}")
     
     driver.get(url)
     WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-    
-    try:
-        if 'captcha' in driver.page_source.lower():
-            return {'error': 'CAPTCHA_DETECTADO', 'message': 'Amazon requiere verificación CAPTCHA'}
-    except:
-        pass
+    check_blocked(driver, url)
     
     config = {'currency': 'MXN', 'store': 'Amazon'}
-    result = universal_extract(driver, url, config)
+    fields = fields or SCRAPE_FIELDS
+    result = universal_extract(driver, url, config, progress, fields)
     
-    if result['price'] == 0:
+    if 'price' in fields and result['price'] == 0:
         amazon_price_selectors = [
             '#corePrice_feature_div .a-offscreen',
             '.a-price .a-offscreen',
@@ -559,7 +1711,7 @@ def scrape_amazon(driver, url):
             except:
                 pass
     
-    if not result['name'] or len(result['name']) < 5:
+    if 'name' in fields and (not result['name'] or len(result['name']) < 5):
         try:
             title = driver.find_element(By.ID, 'productTitle')
             if title:
@@ -570,15 +1722,207 @@ def scrape_amazon(driver, url):
     return result
 
 
-def scrape_generic(driver, url, platform_config):
+def scrape_generic(driver, url, platform_config, progress=None, fields=None):
     """Scraping genérico para cualquier tienda"""
     print(f"[GEN] Scraping: {url}")
     
     driver.get(url)
     WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-    time.sleep(3)
+    check_blocked(driver, url)
+    if not meta_answerable(fields):
+        time.sleep(3)
     
-    return universal_extract(driver, url, platform_config)
+    return universal_extract(driver, url, platform_config, progress, fields)
+
+
+def scrape_product(url, platform_name, platform_config, fields=None):
+    """Adaptador síncrono del pipeline para las rutas Flask"""
+    return run_async(scrape_product_async(url, platform_name, platform_config, fields=fields))
+
+
+SCRAPE_CACHE_TTL = float(os.environ.get('SCRAPE_CACHE_TTL', 3600))
+INFLIGHT_WAIT = float(os.environ.get('INFLIGHT_WAIT', 60))
+RATE_STATE_TTL = 600
+
+
+async def store_call(fn, *args):
+    """Llamar al backend compartido fuera del event loop; si falla se sigue sin cache"""
+    try:
+        return await asyncio.to_thread(fn, *args)
+    except Exception as e:
+        print(f"[CACHE] Error en {fn.__name__}: {str(e)}")
+        return None
+
+
+async def get_cached_result(cache_key, fields):
+    """Resultado en cache solo si algún scrape anterior ya intentó todos los campos pedidos
+    (un scrape rápido de nombre y precio no sirve para una petición que también pide imagen)"""
+    entry = await store_call(shared_store.get_json, cache_key)
+    if not entry or not set(fields or SCRAPE_FIELDS) <= set(entry.get('fields') or []):
+        return None
+    cached = entry.get('result') or {}
+    if has_fields(cached, required_fields(fields)):
+        return cached
+    return None
+
+
+async def wait_for_inflight(cache_key, fields):
+    """Otra petición (en esta u otra máquina) ya scrapea la URL: esperar su resultado"""
+    deadline = time.monotonic() + INFLIGHT_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.5)
+        cached = await get_cached_result(cache_key, fields)
+        if cached:
+            return cached
+        if not await store_call(shared_store.get, 'lock:' + cache_key):
+            return None
+    return None
+
+
+async def scrape_product_async(url, platform_name, platform_config, progress=None, fields=None):
+    """Pipeline completo con cache compartida: si la URL ya se scrapeó (en cualquier máquina)
+    se reutiliza; si otra petición la está scrapeando se espera su resultado."""
+    cache_key = 'scrape:' + hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    token = None
+    cached = await get_cached_result(cache_key, fields)
+    if not cached:
+        token = await store_call(shared_store.acquire_lock, 'lock:' + cache_key, SCRAPE_TIMEOUT)
+        if not token:
+            print(f"[CACHE] Scrape en curso para {url}, esperando resultado")
+            cached = await wait_for_inflight(cache_key, fields)
+    if cached:
+        print(f"[CACHE] Hit: {url}")
+        if progress:
+            progress.report(cached, 'cache', provisional=False)
+        return cached
+
+    try:
+        result = await scrape_with_rate_limit(url, platform_name, platform_config, progress, fields)
+        # Nunca se guardan errores ni páginas de bloqueo
+        if 'error' not in result:
+            previous = await store_call(shared_store.get_json, cache_key) or {}
+            merged = {**(previous.get('result') or {}), **{k: v for k, v in result.items() if v}}
+            # Campos intentados: los pedidos más los que ya se encontraron (ej. la imagen que trae la API)
+            attempted = set(previous.get('fields') or []) | set(fields or SCRAPE_FIELDS)
+            attempted |= {field for field in SCRAPE_FIELDS if merged.get(field)}
+            entry = {'result': merged, 'fields': [field for field in SCRAPE_FIELDS if field in attempted]}
+            await store_call(shared_store.set_json, cache_key, entry, SCRAPE_CACHE_TTL)
+        return result
+    finally:
+        if token:
+            await store_call(shared_store.release_lock, 'lock:' + cache_key, token)
+
+
+async def scrape_with_rate_limit(url, platform_name, platform_config, progress=None, fields=None):
+    """Sincronizar el estado adaptativo del dominio con las demás máquinas alrededor del scrape"""
+    domain = get_domain(url)
+    state_key = 'ratelimit:' + domain
+    rate_limiter.merge_state(domain, await store_call(shared_store.get_json, state_key))
+
+    try:
+        return await scrape_and_record(url, platform_name, platform_config, progress, fields)
+    finally:
+        await store_call(shared_store.set_json, state_key, rate_limiter.export_state(domain), RATE_STATE_TTL)
+
+
+def is_store_failure(error):
+    """True si el error es atribuible a la tienda (timeout de carga, error de red/HTTP).
+    Las caídas locales (Chrome que no arranca, chromedriver caído, errores del extractor)
+    no bajan la tasa del dominio."""
+    if isinstance(error, (TimeoutException, aiohttp.ClientError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, WebDriverException):
+        return 'net::err_' in (error.msg or '').lower()
+    return False
+
+
+async def scrape_and_record(url, platform_name, platform_config, progress=None, fields=None):
+    """API estructurada primero y, si no alcanza, navegador.
+    Cada scrape espera su turno en el rate limiter del dominio y reporta el resultado."""
+    domain = get_domain(url)
+    if not await rate_limiter.acquire(domain):
+        return {'error': 'RATE_LIMITED', 'message': f'Demasiadas peticiones en cola para {domain}'}
+
+    try:
+        result = await run_scrapers(url, platform_name, platform_config, progress, fields)
+    except BlockedPageError as e:
+        print(f"[BLOCK] {str(e)}")
+        rate_limiter.record(domain, 'captcha')
+        return {
+            'error': e.code,
+            'message': f"{platform_config.get('store', 'La tienda')} bloqueó la petición ({e.signal})",
+            'blocked': True
+        }
+    except Exception as e:
+        # Ni una cancelación del cliente ni un fallo local del navegador cuentan como error del dominio
+        if not (progress and progress.cancelled.is_set()) and is_store_failure(e):
+            rate_limiter.record(domain, 'error')
+        raise
+
+    if 'error' in result:
+        rate_limiter.record(domain, 'error')
+    else:
+        rate_limiter.record(domain, 'ok')
+    return result
+
+
+async def run_scrapers(url, platform_name, platform_config, progress=None, fields=None):
+    """Ejecutar las fuentes estructuradas y, si no alcanzan, el scraper de la plataforma"""
+    result = await fetch_structured_product(url, platform_name, platform_config, fields)
+    if result:
+        if progress:
+            progress.report(result, 'api', provisional=False)
+        return result
+
+    if progress:
+        progress.check()
+    return await run_in_browser(run_browser_scraper, url, platform_name, platform_config, progress, fields)
+
+
+def run_browser_scraper(url, platform_name, platform_config, progress=None, fields=None):
+    """Abrir Chrome y ejecutar el scraper específico de la plataforma (corre en el pool de navegadores)"""
+    if progress:
+        progress.check()
+
+    driver = get_chrome_driver(headless=True)
+    if progress:
+        progress.attach_driver(driver)
+    try:
+        if platform_name == 'mercadolibre':
+            return scrape_mercadolibre(driver, url, progress, fields)
+        elif platform_name == 'amazon':
+            return scrape_amazon(driver, url, progress, fields)
+        return scrape_generic(driver, url, platform_config, progress, fields)
+    finally:
+        # Si el cliente canceló, el driver ya se cerró en ScrapeProgress.cancel()
+        if not progress or progress.detach_driver():
+            quit_driver(driver)
+
+
+def parse_fields(value):
+    """Normalizar la proyección "fields" del body (lista o texto separado por comas)"""
+    if value is None or value == '' or value == []:
+        return list(SCRAPE_FIELDS)
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list):
+        raise ValueError(f"\"fields\" debe ser una lista o texto separado por comas. Usa: {', '.join(SCRAPE_FIELDS)}")
+    fields = [str(field).strip() for field in value if str(field).strip()]
+    invalid = [field for field in fields if field not in SCRAPE_FIELDS]
+    if invalid or not fields:
+        raise ValueError(f"Campos no soportados: {', '.join(invalid) or 'ninguno'}. Usa: {', '.join(SCRAPE_FIELDS)}")
+    return [field for field in SCRAPE_FIELDS if field in fields]
+
+
+def project_result(result, fields):
+    """Dejar en la respuesta solo los campos pedidos (más moneda y tienda)"""
+    if 'error' in result:
+        return result
+    projected = {field: result.get(field) for field in fields}
+    projected['currency'] = result.get('currency')
+    projected['store'] = result.get('store')
+    return projected
 
 
 # ============================================
@@ -589,6 +1933,7 @@ def take_screenshot(driver, url):
     print(f"[DEBUG] Tomando screenshot de: {url}")
     
     driver.get(url)
+    check_blocked(driver, url)
     time.sleep(3)
     
     screenshot = driver.get_screenshot_as_base64()
@@ -625,128 +1970,200 @@ def take_screenshot(driver, url):
     }
 
 
+def run_debug_browser(url):
+    """Abrir Chrome y tomar la captura (corre en el pool de navegadores)"""
+    driver = get_chrome_driver(headless=True)
+    try:
+        return take_screenshot(driver, url)
+    finally:
+        quit_driver(driver)
+
+
+async def debug_screenshot_async(url):
+    """Captura de debug con la misma cortesía que un scrape: turno en el rate limiter del dominio,
+    pool de navegadores y detección de bloqueo"""
+    domain = get_domain(url)
+    if not await rate_limiter.acquire(domain):
+        return {'success': False, 'error': 'RATE_LIMITED', 'message': f'Demasiadas peticiones en cola para {domain}'}
+
+    try:
+        result = await run_in_browser(run_debug_browser, url)
+    except BlockedPageError as e:
+        print(f"[BLOCK] {str(e)}")
+        rate_limiter.record(domain, 'captcha')
+        return {'success': False, 'error': e.code, 'message': str(e), 'blocked': True}
+    except Exception as e:
+        if is_store_failure(e):
+            rate_limiter.record(domain, 'error')
+        raise
+
+    rate_limiter.record(domain, 'ok')
+    return {'success': True, **result}
+
+
 # ============================================
 # ENDPOINTS
 # ============================================
-@app.route('/scrape/quick', methods=['POST'])
-@app.route('/api/scrape/quick', methods=['POST'])
-def scrape_quick():
+# Cada endpoint de scraping es una corrutina que devuelve (payload, status). La sirven tanto las
+# rutas Flask (con run_async) como el servidor ASGI (con await_core, sin ocupar un hilo).
+def scrape_payload(url, platform, result):
+    """Cuerpo de respuesta de un scrape: error tal cual o datos con URL, plataforma y fecha"""
+    if 'error' in result:
+        return {'success': False, **result}
+    return {
+        'success': True,
+        'data': {
+            'url': url,
+            'platform': platform,
+            **result,
+            'scrapedAt': datetime.now(timezone.utc).isoformat()
+        }
+    }
+
+
+async def scrape_quick_async(data):
     """Scraping rápido: solo nombre y precio (sin imagen)"""
-    data = request.get_json() or {}
     url = data.get('url')
     
     if not url:
-        return jsonify({'error': 'URL es requerida'}), 400
+        return {'error': 'URL es requerida'}, 400
     
-    driver = None
     try:
         platform_name, platform = detect_platform(url)
         print(f"\n[QUICK] 🚀 Scraping rápido: {platform.get('store', 'Unknown')}")
         print(f"[QUICK] URL: {url}")
         
-        driver = get_chrome_driver(headless=True)
-        
-        # Usar función específica de la plataforma
-        if platform_name == 'mercadolibre':
-            result = scrape_mercadolibre(driver, url)
-        elif platform_name == 'amazon':
-            result = scrape_amazon(driver, url)
-        else:
-            result = scrape_generic(driver, url, platform)
-        
-        driver.quit()
-        
-        # Remover la imagen de la respuesta rápida
-        result['image'] = ''
+        # Solo nombre y precio: no se buscan imágenes
+        result = await scrape_product_async(url, platform_name, platform, fields=['name', 'price'])
+        result = project_result(result, ['name', 'price'])
         
         if 'error' in result:
-            return jsonify({'success': False, **result})
+            return {'success': False, **result}, 200
         
-        return jsonify({
-            'success': True,
-            'data': {
-                'url': url,
-                'platform': platform,
-                **result,
-                'scrapedAt': datetime.now(timezone.utc).isoformat()
-            }
-        })
+        return scrape_payload(url, platform, {**result, 'image': ''}), 200
     
     except Exception as e:
         print(f"[QUICK ERROR] {str(e)}")
         traceback.print_exc()
-        if driver:
-            driver.quit()
         
-        return jsonify({
+        return {
             'success': False,
             'error': 'ERROR_SCRAPING',
             'message': str(e)
-        }), 500
+        }, 500
 
 
-@app.route('/scrape/image', methods=['POST'])
-@app.route('/api/scrape/image', methods=['POST'])
-def scrape_image():
+async def scrape_image_async(data):
     """Obtener solo la imagen del producto"""
-    data = request.get_json() or {}
     url = data.get('url')
     
     if not url:
-        return jsonify({'error': 'URL es requerida'}), 400
+        return {'error': 'URL es requerida'}, 400
     
-    driver = None
     try:
         platform_name, platform = detect_platform(url)
         print(f"\n[IMAGE] 🖼️ Obteniendo imagen: {platform.get('store', 'Unknown')}")
         
-        driver = get_chrome_driver(headless=True)
-        driver.get(url)
-        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-        
-        image_url = ''
-        image_selectors = [
-            '.product-image img', '.pdp-image img', '.gallery-image img',
-            '#landingImage', '#imgBlkFront', '#main-image',
-            '.ui-pdp-image', '.ui-pdp-gallery__figure img',
-            '[data-testid="product-image"]', '[data-zoom]',
-            '.product__photo img', '.primary-image',
-            'img[class*="product"]', 'img[class*="gallery"]',
-            'meta[property="og:image"]'
-        ]
-        
-        for selector in image_selectors:
-            try:
-                if 'meta' in selector:
-                    element = driver.find_element(By.CSS_SELECTOR, selector)
-                    image_url = element.get_attribute('content')
-                else:
-                    element = driver.find_element(By.CSS_SELECTOR, selector)
-                    image_url = (element.get_attribute('src') or 
-                               element.get_attribute('data-src') or 
-                               element.get_attribute('data-zoom'))
-                
-                if image_url and image_url.startswith('http'):
-                    break
-            except:
-                pass
+        # Solo imagen: el extractor se detiene en cuanto la encuentra (normalmente en meta tags)
+        result = await scrape_product_async(url, platform_name, platform, fields=['image'])
         
-        driver.quit()
+        if 'error' in result:
+            return {'success': False, **result}, 200
         
-        return jsonify({
+        return {
             'success': True,
-            'image': image_url
-        })
+            'image': result['image']
+        }, 200
     
     except Exception as e:
         print(f"[IMAGE ERROR] {str(e)}")
-        if driver:
-            driver.quit()
         
-        return jsonify({
+        return {
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500
+
+
+def parse_scrape_request(data):
+    """Validar el body de /api/scrape; devuelve (url, fields) o lanza ValueError con el motivo del 400"""
+    url = data.get('url')
+    if not url:
+        raise ValueError('URL es requerida')
+    return url, parse_fields(data.get('fields'))
+
+
+def wants_stream(data, accept):
+    """Modo streaming: "stream": true en el body o Accept: application/x-ndjson"""
+    return data.get('stream') is True or 'application/x-ndjson' in (accept or '')
+
+
+def start_scrape(url, fields):
+    """Registrar el inicio del scrape y detectar la plataforma"""
+    print(f"\n{'='*60}")
+    print(f"[SCRAPE] URL: {url}")
+    print(f"{'='*60}")
+    
+    platform, config = detect_platform(url)
+    print(f"[SCRAPE] Plataforma: {platform} | Tienda: {config['store']} | Campos: {', '.join(fields)}")
+    return platform, config
+
+
+async def scrape_async(url, fields):
+    """Scrape completo (sin streaming) de /api/scrape"""
+    try:
+        platform, config = start_scrape(url, fields)
+        result = project_result(await scrape_product_async(url, platform, config, fields=fields), fields)
+        return scrape_payload(url, platform, result), 200
+    
+    except Exception as e:
+        print(f"[ERROR] {str(e)}")
+        traceback.print_exc()
+        
+        return {
+            'success': False,
+            'error': 'ERROR_SCRAPING',
+            'message': str(e)
+        }, 500
+
+
+async def debug_async(data):
+    """Endpoint de debug con screenshot"""
+    url = data.get('url')
+    
+    if not url:
+        return {'error': 'URL es requerida'}, 400
+    
+    try:
+        return await debug_screenshot_async(url), 200
+    except Exception as e:
+        return {'success': False, 'error': str(e)}, 500
+
+
+def ndjson_line(event):
+    return json.dumps(event, ensure_ascii=False) + '\n'
+
+
+def final_event(url, platform, result, fields):
+    return {'event': 'final', **scrape_payload(url, platform, project_result(result, fields or SCRAPE_FIELDS))}
+
+
+def stream_error_event(error):
+    print(f"[STREAM ERROR] {str(error)}")
+    return {'event': 'final', 'success': False, 'error': 'ERROR_SCRAPING', 'message': str(error)}
+
+
+@app.route('/scrape/quick', methods=['POST'])
+@app.route('/api/scrape/quick', methods=['POST'])
+def scrape_quick():
+    payload, status = run_async(scrape_quick_async(request.get_json() or {}))
+    return jsonify(payload), status
+
+
+@app.route('/scrape/image', methods=['POST'])
+@app.route('/api/scrape/image', methods=['POST'])
+def scrape_image():
+    payload, status = run_async(scrape_image_async(request.get_json() or {}))
+    return jsonify(payload), status
 
 
 @app.route('/', methods=['GET'])
@@ -758,10 +2175,11 @@ def home():
         'version': '2.0.0',
         'supported_stores': list(PLATFORM_CONFIG.keys()) + ['cualquier tienda online'],
         'endpoints': {
-            'POST /api/scrape': 'Scrape product from any URL',
+            'POST /api/scrape': 'Scrape product from any URL (optional "fields": name, price, image)',
             'POST /scrape': 'Alias for /api/scrape',
             'POST /api/debug': 'Get screenshot and debug info',
-            'POST /debug': 'Alias for /api/debug'
+            'POST /debug': 'Alias for /api/debug',
+            'GET /api/ratelimit': 'Per-domain rate, backoff and CAPTCHA rate'
         }
     })
 
@@ -775,84 +2193,258 @@ def scrape():
         return '', 200
     
     data = request.get_json() or {}
-    url = data.get('url')
-    
-    if not url:
-        return jsonify({'error': 'URL es requerida'}), 400
-    
-    print(f"\n{'='*60}")
-    print(f"[SCRAPE] URL: {url}")
-    print(f"{'='*60}")
-    
-    driver = None
     try:
-        driver = get_chrome_driver(headless=True)
-        platform, config = detect_platform(url)
-        print(f"[SCRAPE] Plataforma: {platform} | Tienda: {config['store']}")
-        
-        if platform == 'mercadolibre':
-            result = scrape_mercadolibre(driver, url)
-        elif platform == 'amazon':
-            result = scrape_amazon(driver, url)
-        else:
-            result = scrape_generic(driver, url, config)
-        
-        driver.quit()
-        
-        if 'error' in result:
-            return jsonify({'success': False, **result})
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'url': url,
-                'platform': platform,
-                **result,
-                'scrapedAt': datetime.now(timezone.utc).isoformat()
-            }
-        })
+        url, fields = parse_scrape_request(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    except Exception as e:
-        print(f"[ERROR] {str(e)}")
-        traceback.print_exc()
-        if driver:
-            driver.quit()
-        
-        return jsonify({
-            'success': False,
-            'error': 'ERROR_SCRAPING',
-            'message': str(e)
-        }), 500
+    # Modo streaming: NDJSON con cada campo apenas se encuentra
+    if wants_stream(data, request.headers.get('Accept')):
+        return stream_scrape(url, fields)
+    
+    payload, status = run_async(scrape_async(url, fields))
+    return jsonify(payload), status
+
+
+def stream_scrape(url, fields=None):
+    """Respuesta NDJSON progresiva: eventos 'field' (provisionales) y un evento 'final'.
+    Si el cliente cierra la conexión se cancelan las estrategias restantes y se libera el driver."""
+    platform, config = start_scrape(url, fields or SCRAPE_FIELDS)
+    progress = ScrapeProgress(fields)
+    future = asyncio.run_coroutine_threadsafe(
+        scrape_product_async(url, platform, config, progress, fields), get_event_loop()
+    )
+    future.add_done_callback(lambda f: progress.emit({'event': 'done'}))
+
+    def generate():
+        finished = False
+        deadline = time.monotonic() + SCRAPE_TIMEOUT
+        try:
+            while True:
+                try:
+                    event = progress.events.get(timeout=2)
+                except queue.Empty:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError('Tiempo de scraping excedido')
+                    # Heartbeat: mantiene viva la conexión y detecta si el cliente se fue
+                    yield ndjson_line({'event': 'ping'})
+                    continue
+                if event['event'] == 'done':
+                    break
+                yield ndjson_line(event)
+
+            result = future.result()
+            finished = True
+            yield ndjson_line(final_event(url, platform, result, fields))
+        except Exception as e:
+            finished = True
+            yield ndjson_line(stream_error_event(e))
+        finally:
+            if not finished or not future.done():
+                progress.cancel()
+                future.cancel()
+
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/ratelimit', methods=['GET'])
+def ratelimit_status():
+    """Estado del rate limiter por dominio"""
+    return jsonify({
+        'success': True,
+        'domains': rate_limiter.snapshot()
+    })
 
 
 @app.route('/debug', methods=['POST'])
 @app.route('/api/debug', methods=['POST'])
 def debug():
-    """Endpoint de debug con screenshot"""
-    data = request.get_json() or {}
-    url = data.get('url')
-    
-    if not url:
-        return jsonify({'error': 'URL es requerida'}), 400
-    
-    driver = None
+    payload, status = run_async(debug_async(request.get_json() or {}))
+    return jsonify(payload), status
+
+
+# ============================================
+# SERVIDOR ASGI
+# ============================================
+# En producción las rutas de scraping se sirven como corrutinas (uvicorn): una petición en curso
+# espera en el event loop y no ocupa un hilo, así la concurrencia no queda limitada por los hilos
+# del servidor sino por MAX_BROWSERS y el rate limiter. El resto (health check, /api/ratelimit y
+# preflight CORS) es trabajo corto y se delega a la app Flask.
+ASGI_JSON_ROUTES = {
+    '/scrape/quick': scrape_quick_async,
+    '/api/scrape/quick': scrape_quick_async,
+    '/scrape/image': scrape_image_async,
+    '/api/scrape/image': scrape_image_async,
+    '/debug': debug_async,
+    '/api/debug': debug_async,
+}
+ASGI_SCRAPE_ROUTES = ['/scrape', '/api/scrape']
+
+flask_asgi = WsgiToAsgi(app)
+
+
+def cors_headers(scope):
+    """Mismas reglas que flask_cors para las rutas /api/* servidas directamente por ASGI"""
+    if not scope['path'].startswith('/api/'):
+        return []
+    origin = dict(scope['headers']).get(b'origin', b'').decode('latin-1')
+    if origin and try_match_any_pattern(origin, CORS_ORIGINS, caseSensitive=False):
+        return [(b'access-control-allow-origin', origin.encode('latin-1')), (b'vary', b'Origin')]
+    return []
+
+
+async def read_json_body(receive):
+    """Leer el body completo; None si el cliente se desconectó"""
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    data = json.loads(body) if body.strip() else {}
+    return data if isinstance(data, dict) else {}
+
+
+async def send_json(send, payload, status, headers):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())] + headers
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def stream_scrape_async(url, fields):
+    """Versión ASGI de stream_scrape: los eventos llegan a una asyncio.Queue y se esperan sin hilo"""
+    platform, config = start_scrape(url, fields)
+    loop = asyncio.get_running_loop()
+    progress = ScrapeProgress(fields, loop=loop)
+    task = asyncio.ensure_future(await_core(scrape_product_async(url, platform, config, progress, fields)))
+    task.add_done_callback(lambda t: progress.emit({'event': 'done'}))
+
+    finished = False
+    deadline = time.monotonic() + SCRAPE_TIMEOUT
     try:
-        driver = get_chrome_driver(headless=True)
-        result = take_screenshot(driver, url)
-        driver.quit()
-        return jsonify({'success': True, **result})
+        while True:
+            try:
+                event = await asyncio.wait_for(progress.events.get(), 2)
+            except asyncio.TimeoutError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError('Tiempo de scraping excedido')
+                yield ndjson_line({'event': 'ping'})
+                continue
+            if event['event'] == 'done':
+                break
+            yield ndjson_line(event)
+
+        result = task.result()
+        finished = True
+        yield ndjson_line(final_event(url, platform, result, fields))
     except Exception as e:
-        if driver:
-            driver.quit()
-        return jsonify({'success': False, 'error': str(e)}), 500
+        finished = True
+        yield ndjson_line(stream_error_event(e))
+    finally:
+        if not finished or not task.done():
+            # Cerrar el driver puede tardar: se hace fuera del loop
+            loop.run_in_executor(None, progress.cancel)
+            task.cancel()
+
+
+async def send_stream(receive, send, lines, headers):
+    """Enviar el NDJSON; si el cliente se desconecta se cancela el scrape"""
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'application/x-ndjson'), (b'x-accel-buffering', b'no')] + headers
+    })
+
+    async def pump():
+        async for line in lines:
+            await send({'type': 'http.response.body', 'body': line.encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def wait_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(wait_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await lines.aclose()
+
+
+async def asgi_lifespan(receive, send):
+    """Al arrancar, el loop del servidor pasa a ser el loop compartido (sin saltos entre hilos)"""
+    global _loop
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            with _loop_lock:
+                if _loop is None:
+                    _loop = asyncio.get_running_loop()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _http_session and not _http_session.closed and _loop is asyncio.get_running_loop():
+                await _http_session.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def asgi_app(scope, receive, send):
+    """Aplicación ASGI: rutas de scraping asíncronas y el resto delegado a Flask"""
+    if scope['type'] == 'lifespan':
+        return await asgi_lifespan(receive, send)
+
+    path = scope.get('path')
+    native = path in ASGI_JSON_ROUTES or path in ASGI_SCRAPE_ROUTES
+    if scope['type'] != 'http' or scope['method'] != 'POST' or not native:
+        return await flask_asgi(scope, receive, send)
+
+    headers = cors_headers(scope)
+    try:
+        data = await read_json_body(receive)
+    except ValueError:
+        return await send_json(send, {'error': 'JSON inválido'}, 400, headers)
+    if data is None:
+        return
+
+    try:
+        if path in ASGI_JSON_ROUTES:
+            payload, status = await asyncio.wait_for(await_core(ASGI_JSON_ROUTES[path](data)), SCRAPE_TIMEOUT)
+            return await send_json(send, payload, status, headers)
+
+        try:
+            url, fields = parse_scrape_request(data)
+        except ValueError as e:
+            return await send_json(send, {'error': str(e)}, 400, headers)
+
+        accept = dict(scope['headers']).get(b'accept', b'').decode('latin-1')
+        if wants_stream(data, accept):
+            return await send_stream(receive, send, stream_scrape_async(url, fields), headers)
+
+        payload, status = await asyncio.wait_for(await_core(scrape_async(url, fields)), SCRAPE_TIMEOUT)
+        return await send_json(send, payload, status, headers)
+    except asyncio.TimeoutError:
+        return await send_json(send, {
+            'success': False,
+            'error': 'ERROR_SCRAPING',
+            'message': 'Tiempo de scraping excedido'
+        }, 500, headers)
 
 
 # ============================================
 # MAIN
 # ============================================
 if __name__ == '__main__':
-    import os
-    
+    import uvicorn
+
     print("\n" + "="*60)
     print("🚀 Universal Product Scraper API v2.0")
     print("="*60)
@@ -868,4 +2460,4 @@ if __name__ == '__main__':
     
     # Obtener puerto de variable de entorno (Fly.io usa PORT)
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
+    uvicorn.run(asgi_app, host='0.0.0.0', port=port)
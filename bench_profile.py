@@ -0,0 +1,165 @@
+"""
+Benchmark del perfil de navegador pre-calentado
+Compara bytes transferidos, tiempo de carga y aviso de cookies entre un perfil nuevo
+por sesión (comportamiento anterior) y un clon de la plantilla pre-calentada, y mide
+cuánto tarda y cuánto ocupa cada clon.
+Por defecto usa las tiendas stub (bundles JS/CSS compartidos + aviso de cookies).
+
+Uso:
+    python bench_profile.py
+    python bench_profile.py --runs 10 --stub-delay-ms 200
+    python bench_profile.py --urls https://www.liverpool.com.mx/tienda/pdp/... --warmup https://www.liverpool.com.mx/
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import app
+import stub_server
+
+# Bytes por red (transferSize es 0 cuando el recurso sale de la cache) y tiempos de navegación
+METRICS_SCRIPT = """
+var nav = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource');
+var transferred = nav ? nav.transferSize : 0;
+var cached = 0;
+resources.forEach(function (r) {
+    transferred += r.transferSize;
+    if (r.transferSize === 0 && r.decodedBodySize > 0) { cached += 1; }
+});
+return {
+    transferred: transferred,
+    resources: resources.length,
+    cached: cached,
+    load_ms: nav ? nav.loadEventEnd - nav.startTime : 0,
+    consent_banner: !!document.querySelector('#onetrust-banner-sdk, #onetrust-accept-btn-handler')
+};
+"""
+
+
+def measure(url):
+    """Abrir una sesión (clon de plantilla o perfil nuevo según la configuración de app), cargar y medir"""
+    start = time.time()
+    driver = app.get_chrome_driver(headless=True)
+    startup = time.time() - start
+    try:
+        driver.get(url)
+        metrics = driver.execute_script(METRICS_SCRIPT)
+    finally:
+        app.quit_driver(driver)
+    metrics['startup_ms'] = round(startup * 1000)
+    return metrics
+
+
+def run_mode(name, urls, runs):
+    samples = []
+    for i in range(runs):
+        for url in urls:
+            sample = measure(url)
+            samples.append(sample)
+            print(f"[BENCH] {name:<9} #{i + 1} {sample['transferred'] / 1024:>8.1f} KB | "
+                  f"carga {sample['load_ms']:>6.0f} ms | cache {sample['cached']}/{sample['resources']} | "
+                  f"aviso cookies {'sí' if sample['consent_banner'] else 'no'}")
+
+    count = len(samples)
+    return {
+        'samples': samples,
+        'avg_kb': round(sum(s['transferred'] for s in samples) / count / 1024, 1),
+        'avg_load_ms': round(sum(s['load_ms'] for s in samples) / count),
+        'avg_startup_ms': round(sum(s['startup_ms'] for s in samples) / count),
+        'consent_banner_rate': round(sum(1 for s in samples if s['consent_banner']) / count, 2)
+    }
+
+
+def dir_size_mb(path):
+    """Tamaño aparente de un directorio en MB (con reflink los bloques se comparten con la plantilla)"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.lstat(os.path.join(root, name)).st_size
+    return round(total / 1024 / 1024, 2)
+
+
+def measure_clones(runs):
+    """Tiempo de clonar la plantilla publicada (lo que paga cada sesión antes de abrir Chrome)"""
+    times = []
+    for _ in range(runs):
+        start = time.time()
+        clone = app.clone_profile_template()
+        times.append((time.time() - start) * 1000)
+        shutil.rmtree(clone, ignore_errors=True)
+    times.sort()
+    return {
+        'template_mb': dir_size_mb(app.current_profile_template()),
+        'clone_avg_ms': round(sum(times) / len(times), 1),
+        'clone_p95_ms': round(times[min(len(times) - 1, int(len(times) * 0.95))], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del perfil pre-calentado')
+    parser.add_argument('--urls', nargs='+', help='Páginas a medir (por defecto, tiendas stub)')
+    parser.add_argument('--warmup', nargs='+', help='Páginas para calentar la plantilla')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--clone-runs', type=int, default=20, help='Clones para medir tiempo de clonado')
+    parser.add_argument('--stub-port', type=int, default=8766)
+    parser.add_argument('--stub-delay-ms', type=float, default=100)
+    parser.add_argument('--output', default='bench_profile_report.json')
+    args = parser.parse_args()
+
+    stub = None
+    urls, warmup = args.urls, args.warmup
+    if not urls:
+        stub_server.DELAY_SECONDS = args.stub_delay_ms / 1000
+        stub = ThreadingHTTPServer(('127.0.0.1', args.stub_port), stub_server.StubHandler)
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{args.stub_port}'
+        urls = [f'{base}/store/meta/bench-a', f'{base}/store/next/bench-b']
+        warmup = warmup or [f'{base}/store/meta/warmup']
+
+    template_root = tempfile.mkdtemp(prefix='bench-profile-')
+    app.PROFILE_TEMPLATE_DIR = f'{template_root}/template'
+    app.PROFILE_REFRESH_SECONDS = float('inf')
+    report = {'urls': urls, 'warmup': warmup}
+    try:
+        app.PROFILE_TEMPLATE_ENABLED = False
+        report['fresh'] = run_mode('nuevo', urls, args.runs)
+
+        app.build_profile_template(warmup or app.PROFILE_WARMUP_URLS)
+        report['clone'] = measure_clones(args.clone_runs)
+        app.PROFILE_TEMPLATE_ENABLED = True
+        report['template'] = run_mode('plantilla', urls, args.runs)
+    finally:
+        shutil.rmtree(template_root, ignore_errors=True)
+        if stub:
+            stub.shutdown()
+
+    fresh, template = report['fresh'], report['template']
+    saved = 1 - template['avg_kb'] / fresh['avg_kb'] if fresh['avg_kb'] else 0
+    faster = 1 - template['avg_load_ms'] / fresh['avg_load_ms'] if fresh['avg_load_ms'] else 0
+    report['savings'] = {'bytes': round(saved, 3), 'load_time': round(faster, 3)}
+
+    print("\n" + "=" * 60)
+    print(f"{'':<12}{'KB/página':>12}{'carga ms':>12}{'arranque ms':>14}{'aviso':>8}")
+    for label, data in [('nuevo', fresh), ('plantilla', template)]:
+        print(f"{label:<12}{data['avg_kb']:>12}{data['avg_load_ms']:>12}{data['avg_startup_ms']:>14}"
+              f"{data['consent_banner_rate']:>8.0%}")
+    print(f"Ahorro: {saved:.0%} bytes | {faster:.0%} tiempo de carga")
+    clone = report['clone']
+    print(f"Clon: {clone['template_mb']} MB | {clone['clone_avg_ms']} ms promedio | "
+          f"{clone['clone_p95_ms']} ms p95")
+    print("=" * 60)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[BENCH] Reporte: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,430 @@
+"""
+Pruebas de carga y modelo de capacidad de la API
+Reproduce una mezcla realista de /api/scrape, /api/scrape/quick, /api/scrape/image y /api/debug
+contra las tiendas stub (stub_server.py), sube la carga por escalones y registra throughput,
+latencias de cola, errores, memoria y procesos de Chrome. El reporte final indica la máxima
+tasa sostenible (RPS) de cada configuración.
+
+Uso:
+    python loadtest.py
+    python loadtest.py --configs MAX_BROWSERS=1 MAX_BROWSERS=2 --steps 0.5 1 2 4 --step-seconds 60
+    python loadtest.py --target http://127.0.0.1:8080 --pid 1234
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import stub_server
+
+ENDPOINTS = {
+    'scrape': '/api/scrape',
+    'quick': '/api/scrape/quick',
+    'image': '/api/scrape/image',
+    'debug': '/api/debug',
+}
+
+# Mezcla de tráfico por endpoint (proporción de peticiones)
+TRAFFIC_MIX = {'scrape': 0.5, 'quick': 0.3, 'image': 0.15, 'debug': 0.05}
+
+# Mezcla de páginas de tienda (configurable con --page-mix). La mayoría del tráfico real
+# (Amazon, Liverpool, Walmart...) solo se resuelve renderizando en Chrome ('meta');
+# 'next'/'preloaded' (estado embebido) y 'meli' (API de items) no abren el navegador.
+PAGE_MIX = {'meta': 0.75, 'next': 0.08, 'preloaded': 0.04, 'meli': 0.08, 'captcha': 0.05}
+PAGE_KINDS = ['meta', 'next', 'preloaded', 'meli', 'captcha']
+BROWSER_KINDS = ['meta', 'captcha']
+
+# Host de cada tipo de página solo-navegador. Cada uno es un dominio aparte para la app (cache de
+# estado embebido y rate limiter por dominio), así el backoff por CAPTCHA no frena las páginas 'meta'.
+# El resto de las páginas usa 127.0.0.1. 127.0.0.2 es loopback en Linux sin configuración extra.
+STORE_HOSTS = {'meta': 'localhost', 'captcha': '127.0.0.2'}
+
+# Entorno base de la app bajo prueba: rate limiting alto para medir la capacidad del
+# servicio y no la cortesía con las tiendas (las tiendas stub son solo tres dominios)
+BASE_APP_ENV = {
+    'RATE_LIMIT_RPS': '1000',
+    'RATE_LIMIT_BURST': '1000',
+    'CACHE_URL': 'memory://',
+}
+
+_slug_counter = itertools.count()
+
+
+def pick(weights, rng):
+    """Elegir una llave según su peso"""
+    keys = list(weights)
+    return rng.choices(keys, weights=[weights[k] for k in keys])[0]
+
+
+def build_product_url(stub_base, rng, repeat_ratio, page_mix):
+    """URL de producto de la tienda stub; `repeat_ratio` controla cuántas se repiten (aciertos de cache)"""
+    kind = pick(page_mix, rng)
+    if rng.random() < repeat_ratio:
+        slug = f'hot-{rng.randrange(20)}'
+        item_id = 100 + rng.randrange(20)
+    else:
+        n = next(_slug_counter)
+        slug = f'p{n}-{rng.randrange(10**6)}'
+        item_id = 10**6 + n
+
+    if kind == 'meli':
+        return f'{stub_base}/mercadolibre/MLM-{item_id}-producto-stub'
+    if kind in STORE_HOSTS:
+        # Tiendas solo-DOM en otro dominio: la app aprende que no traen estado embebido
+        # y va directo a Chrome, como con una tienda real distinta
+        return f"{stub_base.replace('127.0.0.1', STORE_HOSTS[kind])}/store/{kind}/{slug}"
+    return f'{stub_base}/store/{kind}/{slug}'
+
+
+def parse_mix(text):
+    """'meta=0.8,next=0.2' -> mezcla de páginas normalizada"""
+    mix = {}
+    for item in text.split(','):
+        kind, weight = item.split('=', 1)
+        if kind not in PAGE_KINDS:
+            raise argparse.ArgumentTypeError(f"Tipo de página desconocido: {kind} (usa {', '.join(PAGE_KINDS)})")
+        mix[kind] = float(weight)
+    total = sum(mix.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError('La mezcla de páginas debe tener algún peso positivo')
+    return {kind: round(weight / total, 4) for kind, weight in mix.items()}
+
+
+# ============================================
+# MUESTREO DE RECURSOS (Linux /proc)
+# ============================================
+def process_tree(pid):
+    """PIDs del proceso y todos sus descendientes (incluye los Chrome lanzados por Selenium)"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+            ppid = int(stat[stat.rindex(')') + 2:].split()[1])
+            children.setdefault(ppid, []).append(int(entry))
+        except (OSError, ValueError, IndexError):
+            pass
+
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def sample_resources(pid):
+    """Memoria RSS total (MB) y número de procesos de Chrome del árbol de la app"""
+    rss_kb, chrome = 0, 0
+    for proc in process_tree(pid):
+        try:
+            with open(f'/proc/{proc}/status') as f:
+                status = f.read()
+            name = status.split('\n', 1)[0].split(':', 1)[1].strip().lower()
+            if 'chrom' in name and 'driver' not in name:  # No contar chromedriver
+                chrome += 1
+            for line in status.splitlines():
+                if line.startswith('VmRSS:'):
+                    rss_kb += int(line.split()[1])
+        except (OSError, ValueError, IndexError):
+            pass
+    return {'rss_mb': round(rss_kb / 1024, 1), 'chrome_processes': chrome}
+
+
+class ResourceSampler(threading.Thread):
+    """Hilo que toma una muestra de recursos cada `interval` segundos"""
+
+    def __init__(self, pid, interval):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            if self.pid:
+                self.samples.append({'t': time.time(), **sample_resources(self.pid)})
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+
+    def window(self, start, end):
+        return [s for s in self.samples if start <= s['t'] <= end]
+
+
+# ============================================
+# GENERACIÓN DE CARGA
+# ============================================
+def fire(target, endpoint, product_url, timeout, scheduled):
+    """Hacer una petición y clasificar el resultado.
+    La latencia se mide desde la hora programada de envío (no desde que un worker la toma),
+    así el tiempo en cola del cliente cuenta en p95/p99 (sin omisión coordinada)."""
+    body = json.dumps({'url': product_url}).encode('utf-8')
+    req = urllib.request.Request(target + ENDPOINTS[endpoint], data=body,
+                                 headers={'Content-Type': 'application/json'})
+    start = scheduled
+    outcome, status = 'ok', 0
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            status = response.status
+            payload = json.loads(response.read().decode('utf-8'))
+        if not payload.get('success'):
+            outcome = 'blocked' if payload.get('blocked') else 'failed'
+    except urllib.error.HTTPError as e:
+        status = e.code
+        outcome = 'error'
+    except Exception:
+        outcome = 'error'
+
+    return {
+        'endpoint': endpoint,
+        'start': start,
+        'latency': time.time() - start,
+        'status': status,
+        'outcome': outcome
+    }
+
+
+def run_step(target, rps, seconds, rng, args, stub_base):
+    """Carga de lazo abierto: `rps` peticiones por segundo durante `seconds`, sin esperar respuestas"""
+    total = max(1, int(rps * seconds))
+    start = time.time()
+    futures = []
+    with ThreadPoolExecutor(max_workers=args.max_inflight) as pool:
+        for i in range(total):
+            scheduled = start + i / rps
+            delay = scheduled - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            endpoint = pick(TRAFFIC_MIX, rng)
+            product_url = build_product_url(stub_base, rng, args.repeat_ratio, args.page_mix)
+            futures.append(pool.submit(fire, target, endpoint, product_url, args.timeout, scheduled))
+        records = [f.result() for f in futures]
+    return records, start, time.time()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(records, start, end, offered_rps, samples, args):
+    """Métricas de un escalón y si la tasa es sostenible según los SLO"""
+    elapsed = max(end - start, 1e-6)
+    latencies = [r['latency'] for r in records]
+    counts = {o: sum(1 for r in records if r['outcome'] == o) for o in ['ok', 'blocked', 'failed', 'error']}
+    error_rate = counts['error'] / len(records)
+    # 'failed': la app respondió success=false sin bloqueo (p. ej. RATE_LIMITED); 'blocked' es esperado
+    failed_rate = counts['failed'] / len(records)
+    p95 = percentile(latencies, 95)
+    throughput = len(records) / elapsed
+
+    by_endpoint = {}
+    for endpoint in ENDPOINTS:
+        lat = [r['latency'] for r in records if r['endpoint'] == endpoint]
+        if lat:
+            by_endpoint[endpoint] = {
+                'requests': len(lat),
+                'p50': round(percentile(lat, 50), 3),
+                'p95': round(percentile(lat, 95), 3),
+                'errors': sum(1 for r in records if r['endpoint'] == endpoint and r['outcome'] == 'error'),
+                'failed': sum(1 for r in records if r['endpoint'] == endpoint and r['outcome'] == 'failed')
+            }
+
+    sustainable = (
+        error_rate <= args.max_error_rate
+        and failed_rate <= args.max_failed_rate
+        and p95 <= args.p95_slo
+        and throughput >= offered_rps * 0.9
+    )
+
+    return {
+        'offered_rps': offered_rps,
+        'throughput_rps': round(throughput, 3),
+        'requests': len(records),
+        'outcomes': counts,
+        'error_rate': round(error_rate, 4),
+        'failed_rate': round(failed_rate, 4),
+        'latency': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(p95, 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(max(latencies), 3)
+        },
+        'by_endpoint': by_endpoint,
+        'peak_rss_mb': max((s['rss_mb'] for s in samples), default=None),
+        'peak_chrome_processes': max((s['chrome_processes'] for s in samples), default=None),
+        'sustainable': sustainable
+    }
+
+
+# ============================================
+# APP BAJO PRUEBA
+# ============================================
+def start_app(config_env, port, stub_base):
+    """Levantar app.py con la configuración indicada y esperar al health check"""
+    env = {**os.environ, **BASE_APP_ENV, 'PORT': str(port), 'MELI_API_BASE': f'{stub_base}/meli',
+           'PROFILE_WARMUP_URLS': f'{stub_base}/store/meta/warmup', **config_env}
+    proc = subprocess.Popen([sys.executable, 'app.py'], env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    target = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(target + '/', timeout=2):
+                return proc, target
+        except Exception:
+            time.sleep(0.5)
+    proc.kill()
+    raise RuntimeError('La app no respondió al health check')
+
+
+def run_config(name, config_env, args, stub_base):
+    """Barrido de escalones para una configuración; se detiene al primer escalón no sostenible"""
+    proc = None
+    if args.target:
+        target, pid = args.target.rstrip('/'), args.pid
+    else:
+        proc, target = start_app(config_env, args.port, stub_base)
+        pid = proc.pid
+
+    print(f"\n[LOAD] Configuración: {name} -> {target}")
+    sampler = ResourceSampler(pid, args.sample_interval)
+    sampler.start()
+    rng = random.Random(args.seed)
+    steps = []
+    try:
+        for rps in args.steps:
+            records, start, end = run_step(target, rps, args.step_seconds, rng, args, stub_base)
+            step = summarize(records, start, end, rps, sampler.window(start, end), args)
+            steps.append(step)
+            print(f"[LOAD]   {rps:>6} rps ofrecidos | {step['throughput_rps']:>7} rps | "
+                  f"p95 {step['latency']['p95']:>7}s | errores {step['error_rate']:.1%} | "
+                  f"fallidas {step['failed_rate']:.1%} | "
+                  f"RSS {step['peak_rss_mb']} MB | chrome {step['peak_chrome_processes']} | "
+                  f"{'OK' if step['sustainable'] else 'SATURADO'}")
+            if not step['sustainable']:
+                break
+            time.sleep(args.cooldown)
+    finally:
+        sampler.stop()
+        if proc:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    sustainable = [s['offered_rps'] for s in steps if s['sustainable']]
+    return {
+        'config': config_env,
+        'max_sustainable_rps': max(sustainable) if sustainable else 0,
+        'steps': steps,
+        'timeline': sampler.samples
+    }
+
+
+def start_stubs(port):
+    """Tiendas stub en 127.0.0.1 (también atiende localhost) y en cada host aparte de STORE_HOSTS"""
+    servers = []
+    for host in sorted({'127.0.0.1'} | set(STORE_HOSTS.values()) - {'localhost'}):
+        server = ThreadingHTTPServer((host, port), stub_server.StubHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def parse_config(text):
+    """'MAX_BROWSERS=2,SCRAPE_TIMEOUT=60' -> dict de variables de entorno"""
+    if text in ('', 'default'):
+        return {}
+    return dict(item.split('=', 1) for item in text.split(','))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pruebas de carga y modelo de capacidad')
+    parser.add_argument('--configs', nargs='+', default=['default'],
+                        help='Configuraciones a comparar, ej. MAX_BROWSERS=1 MAX_BROWSERS=2,SCRAPE_TIMEOUT=60')
+    parser.add_argument('--steps', nargs='+', type=float, default=[0.25, 0.5, 1, 2, 4, 8],
+                        help='Escalones de RPS ofrecidos')
+    parser.add_argument('--step-seconds', type=float, default=30)
+    parser.add_argument('--cooldown', type=float, default=5)
+    parser.add_argument('--repeat-ratio', type=float, default=0.2, help='Proporción de URLs repetidas')
+    parser.add_argument('--page-mix', type=parse_mix, default=PAGE_MIX,
+                        help=f"Mezcla de páginas, ej. meta=0.8,next=0.1,meli=0.1 ({', '.join(PAGE_KINDS)})")
+    parser.add_argument('--p95-slo', type=float, default=20, help='p95 máximo aceptable (seg)')
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='Máximo de errores HTTP/red')
+    parser.add_argument('--max-failed-rate', type=float, default=0.02,
+                        help='Máximo de respuestas success=false sin bloqueo (RATE_LIMITED, etc.)')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--max-inflight', type=int, default=256)
+    parser.add_argument('--sample-interval', type=float, default=1)
+    parser.add_argument('--stub-port', type=int, default=8765)
+    parser.add_argument('--stub-delay-ms', type=float, default=150, help='Latencia simulada de las tiendas')
+    parser.add_argument('--port', type=int, default=8181, help='Puerto para la app levantada por el harness')
+    parser.add_argument('--target', help='Usar una app ya corriendo en vez de levantarla')
+    parser.add_argument('--pid', type=int, help='PID de la app en --target (para muestrear memoria)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='loadtest_report.json')
+    args = parser.parse_args()
+
+    stub_server.DELAY_SECONDS = args.stub_delay_ms / 1000
+    stubs = start_stubs(args.stub_port)
+    stub_base = f'http://127.0.0.1:{args.stub_port}'
+    print(f"[LOAD] Tiendas stub en {stub_base} y {', '.join(STORE_HOSTS.values())} "
+          f"(latencia {args.stub_delay_ms} ms)")
+
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'traffic_mix': TRAFFIC_MIX,
+        'page_mix': args.page_mix,
+        'browser_share': round(sum(w for k, w in args.page_mix.items() if k in BROWSER_KINDS), 4),
+        'slo': {'p95_seconds': args.p95_slo, 'max_error_rate': args.max_error_rate,
+                'max_failed_rate': args.max_failed_rate},
+        'configs': {}
+    }
+    try:
+        for name in args.configs:
+            report['configs'][name] = run_config(name, parse_config(name), args, stub_base)
+    finally:
+        for stub in stubs:
+            stub.shutdown()
+
+    print("\n" + "=" * 60)
+    print("📈 Capacidad máxima sostenible")
+    print("=" * 60)
+    for name, result in report['configs'].items():
+        best = [s for s in result['steps'] if s['sustainable']]
+        detail = ''
+        if best:
+            last = best[-1]
+            detail = (f" (p95 {last['latency']['p95']}s, RSS pico {last['peak_rss_mb']} MB, "
+                      f"chrome pico {last['peak_chrome_processes']})")
+        print(f"  • {name}: {result['max_sustainable_rps']} rps{detail}")
+    print("=" * 60)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[LOAD] Reporte: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Servidor stub local que imita a las tiendas soportadas
+Sirve la API de items de MercadoLibre y páginas con estado embebido
+(__NEXT_DATA__, __PRELOADED_STATE__), meta tags y páginas de CAPTCHA/bloqueo
+para pruebas sin red. Las páginas de producto comparten bundles JS/CSS cacheables
+y muestran un aviso de cookies hasta que se acepta, como las tiendas reales.
+
+Uso:
+    python stub_server.py 8765
+    MELI_API_BASE=http://127.0.0.1:8765/meli python app.py
+
+STUB_DELAY_MS simula la latencia de red de las tiendas (útil para pruebas de carga).
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import re
+import sys
+import time
+
+DELAY_SECONDS = float(os.environ.get('STUB_DELAY_MS', 0)) / 1000
+
+PRODUCTS = {
+    'MLM123456789': {
+        'id': 'MLM123456789',
+        'title': 'Audífonos Inalámbricos Stub',
+        'price': 1299.5,
+        'currency_id': 'MXN',
+        'thumbnail': 'http://http2.mlstatic.com/D_stub-I.jpg',
+        'pictures': [{'secure_url': 'https://http2.mlstatic.com/D_stub-O.jpg'}]
+    }
+}
+
+# Bundles compartidos por todas las páginas (cacheables por el navegador)
+STATIC_ASSETS = {
+    'vendor.js': ('application/javascript', "/* vendor bundle */\nvar __stubPadding = '" + 'x' * 300000 + "';\n"),
+    'app.css': ('text/css', 'body { font-family: sans-serif; }\n/* ' + 'y' * 60000 + ' */\n'),
+}
+ASSETS = '<link rel="stylesheet" href="/static/app.css"><script src="/static/vendor.js"></script>'
+
+# Aviso de cookies estilo OneTrust; desaparece cuando existe la cookie de consentimiento
+CONSENT_COOKIE = 'OptanonAlertBoxClosed'
+CONSENT_BANNER = (
+    '<div id="onetrust-banner-sdk"><button id="onetrust-accept-btn-handler" '
+    'onclick="document.cookie=\'' + CONSENT_COOKIE + '=1; path=/; max-age=31536000\'; this.parentNode.remove()">'
+    'Aceptar cookies</button></div>'
+)
+
+NEXT_DATA_PAGE = """<!DOCTYPE html>
+<html><head><title>{name} | Tienda Stub</title>{assets}</head>
+<body>{banner}<div id="__next"><h1>{name}</h1></div>
+<script id="__NEXT_DATA__" type="application/json">{state}</script>
+</body></html>"""
+
+PRELOADED_PAGE = """<!DOCTYPE html>
+<html><head><title>{name} | Tienda Stub</title>{assets}</head>
+<body>{banner}<div id="root"><h1>{name}</h1></div>
+<script>window.__PRELOADED_STATE__ = {state};</script>
+</body></html>"""
+
+META_PAGE = """<!DOCTYPE html>
+<html><head><title>{name} | Tienda Stub</title>
+<meta property="og:title" content="{name}">
+<meta property="og:image" content="https://stub.local/img/{slug}.jpg">
+<meta property="product:price:amount" content="{price}">
+{assets}</head><body>{banner}<h1>{name}</h1><span class="price">${price}</span></body></html>"""
+
+CAPTCHA_PAGE = """<!DOCTYPE html>
+<html><head><title>Robot Check</title></head>
+<body><form action="/errors/validateCaptcha"><input id="captchacharacters"></form></body></html>"""
+
+BLOCKED_PAGE = """<!DOCTYPE html>
+<html><head><title>Access Denied</title></head>
+<body><h1>Access Denied</h1></body></html>"""
+
+
+def fixture_item(item_id):
+    """Publicación de la API de items; cualquier ID MLM<n> existe salvo los que empiezan con 0"""
+    if item_id in PRODUCTS:
+        return PRODUCTS[item_id]
+    match = re.match(r'^MLM([1-9]\d*)$', item_id)
+    if not match:
+        return None
+    return {
+        'id': item_id,
+        'title': f'Producto MercadoLibre {match.group(1)}',
+        'price': 899.0,
+        'currency_id': 'MXN',
+        'pictures': [{'secure_url': f'https://http2.mlstatic.com/D_{item_id}-O.jpg'}]
+    }
+
+
+def fixture_product(slug):
+    return {
+        'name': f'Producto {slug}',
+        'price': 499.0,
+        'image': f'https://stub.local/img/{slug}.jpg',
+        'currency': 'MXN'
+    }
+
+
+def render_store_page(kind, slug, consent_accepted=False):
+    """Renderizar una página de producto de la tienda stub"""
+    product = fixture_product(slug)
+    page = {'name': product['name'], 'assets': ASSETS, 'banner': '' if consent_accepted else CONSENT_BANNER}
+
+    if kind == 'next':
+        state = {'props': {'pageProps': {'product': {
+            'productName': product['name'],
+            'price': {'amount': product['price']},
+            'images': [{'url': product['image']}],
+            'currencyCode': product['currency']
+        }}}}
+        return NEXT_DATA_PAGE.format(state=json.dumps(state), **page)
+
+    if kind == 'preloaded':
+        state = {'pdp': {'item': {
+            'title': product['name'],
+            'sellingPrice': str(product['price']),
+            'imageUrl': product['image']
+        }}}
+        return PRELOADED_PAGE.format(state=json.dumps(state), **page)
+
+    if kind == 'meta':
+        return META_PAGE.format(slug=slug, price=product['price'], **page)
+
+    return None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def _send(self, status, body, content_type, headers=None):
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+        if DELAY_SECONDS:
+            time.sleep(DELAY_SECONDS)
+
+        # /meli/items/<ID>
+        if len(parts) == 3 and parts[:2] == ['meli', 'items']:
+            item = fixture_item(parts[2])
+            if item:
+                return self._send(200, json.dumps(item), 'application/json')
+            return self._send(404, json.dumps({'message': 'item not found', 'status': 404}), 'application/json')
+
+        # /static/<archivo>: bundles compartidos, cacheables un día
+        if len(parts) == 2 and parts[0] == 'static' and parts[1] in STATIC_ASSETS:
+            content_type, body = STATIC_ASSETS[parts[1]]
+            return self._send(200, body, content_type, {'Cache-Control': 'public, max-age=86400'})
+
+        # /store/<captcha|blocked>/<slug>: páginas anti-bot
+        if len(parts) == 3 and parts[:2] == ['store', 'captcha']:
+            return self._send(200, CAPTCHA_PAGE, 'text/html; charset=utf-8')
+        if len(parts) == 3 and parts[:2] == ['store', 'blocked']:
+            return self._send(403, BLOCKED_PAGE, 'text/html; charset=utf-8')
+
+        # /store/<next|preloaded|meta>/<slug>
+        if len(parts) == 3 and parts[0] == 'store':
+            consent = CONSENT_COOKIE in (self.headers.get('Cookie') or '')
+            html = render_store_page(parts[1], parts[2], consent)
+            if html:
+                return self._send(200, html, 'text/html; charset=utf-8')
+
+        self._send(404, 'Not found', 'text/plain')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(port=8765):
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    print(f"[STUB] Tiendas stub en http://127.0.0.1:{port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
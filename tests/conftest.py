@@ -0,0 +1,30 @@
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import stub_server  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def stub_base():
+    """Tiendas stub en un puerto libre durante toda la sesión de pruebas"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), stub_server.StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    if app._http_session:
+        app.run_async(app._http_session.close())
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Cache, rate limiter y perfil aislados por prueba (sin Chrome)"""
+    monkeypatch.setattr(app, 'shared_store', app.MemoryStore())
+    monkeypatch.setattr(app, 'rate_limiter', app.DomainRateLimiter(rate=1000, burst=1000))
+    monkeypatch.setattr(app, 'PROFILE_TEMPLATE_ENABLED', False)
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import threading
+
+import app
+
+
+async def call(method, path, payload=None, headers=()):
+    """Petición directa a asgi_app; devuelve (status, headers, body)"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    messages = [{'type': 'http.request', 'body': body}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+        'method': method, 'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': b'',
+        'headers': [(b'content-type', b'application/json'), *headers],
+        'client': ('127.0.0.1', 5000), 'server': ('testserver', 80),
+    }
+    await app.asgi_app(scope, receive, send)
+    return sent[0]['status'], dict(sent[0]['headers']), b''.join(m.get('body', b'') for m in sent[1:])
+
+
+def test_inflight_scrapes_hold_no_threads(monkeypatch):
+    async def scrape_product_async(url, platform_name, platform_config, progress=None, fields=None):
+        await asyncio.sleep(0.3)
+        return {'name': 'Lámpara', 'price': 10.0, 'image': '', 'currency': 'MXN', 'store': 'Tienda'}
+
+    monkeypatch.setattr(app, 'scrape_product_async', scrape_product_async)
+    app.get_event_loop()
+    baseline = threading.active_count()
+
+    async def scenario():
+        calls = [asyncio.ensure_future(call('POST', '/api/scrape', {'url': f'https://tienda.mx/p/{i}'}))
+                 for i in range(50)]
+        await asyncio.sleep(0.15)
+        peak = threading.active_count()
+        return peak, await asyncio.gather(*calls)
+
+    peak, responses = asyncio.run(scenario())
+    assert peak == baseline
+    assert [status for status, _, _ in responses] == [200] * 50
+    assert json.loads(responses[0][2])['data']['name'] == 'Lámpara'
+
+
+def test_asgi_streams_ndjson(stub_base):
+    status, headers, body = asyncio.run(call('POST', '/api/scrape', {
+        'url': f'{stub_base}/store/next/lampara', 'stream': True
+    }))
+    events = [json.loads(line) for line in body.decode().splitlines()]
+    assert status == 200
+    assert headers[b'content-type'] == b'application/x-ndjson'
+    assert [e['field'] for e in events if e['event'] == 'field'] == ['name', 'price', 'image']
+    assert events[-1]['event'] == 'final'
+    assert events[-1]['data']['name'] == 'Producto lampara'
+
+
+def test_asgi_validates_body():
+    status, _, body = asyncio.run(call('POST', '/api/scrape', {'url': 'https://tienda.mx/p/1', 'fields': 3}))
+    assert status == 400
+    assert 'fields' in json.loads(body)['error']
+    status, _, _ = asyncio.run(call('POST', '/api/scrape/quick', {}))
+    assert status == 400
+
+
+def test_asgi_cors_matches_flask_origins(monkeypatch):
+    async def scrape_image_async(data):
+        return {'success': True, 'image': 'https://img/1.jpg'}, 200
+
+    monkeypatch.setitem(app.ASGI_JSON_ROUTES, '/api/scrape/image', scrape_image_async)
+    _, headers, _ = asyncio.run(call('POST', '/api/scrape/image', {'url': 'x'},
+                                     [(b'origin', b'http://localhost:5173')]))
+    assert headers[b'access-control-allow-origin'] == b'http://localhost:5173'
+    _, headers, _ = asyncio.run(call('POST', '/api/scrape/image', {'url': 'x'},
+                                     [(b'origin', b'https://evil.example')]))
+    assert b'access-control-allow-origin' not in headers
+
+
+def test_other_routes_are_delegated_to_flask():
+    status, _, body = asyncio.run(call('GET', '/'))
+    assert status == 200
+    assert json.loads(body)['status'] == 'ok'
+    _, _, body = asyncio.run(call('GET', '/api/ratelimit'))
+    assert json.loads(body)['success'] is True
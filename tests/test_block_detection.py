@@ -0,0 +1,61 @@
+import hashlib
+
+import pytest
+
+import app
+
+URL = 'https://www.liverpool.com.mx/tienda/pdp/lampara/1234'
+
+
+class FakeDriver:
+    """Driver mínimo para check_blocked: título, código HTTP y elementos presentes en la página"""
+
+    def __init__(self, title='Lámpara | Liverpool', status=200, markers=()):
+        self.title = title
+        self.status = status
+        self.markers = markers
+
+    def execute_script(self, script):
+        return self.status
+
+    def find_elements(self, by, selector):
+        return [object()] if any(marker in selector.split(', ') for marker in self.markers) else []
+
+
+@pytest.mark.parametrize('driver, code', [
+    (FakeDriver(title='Robot Check'), 'CAPTCHA_DETECTADO'),
+    (FakeDriver(title='Access Denied'), 'BLOQUEO_DETECTADO'),
+    (FakeDriver(status=429), 'CAPTCHA_DETECTADO'),
+    (FakeDriver(status=403), 'BLOQUEO_DETECTADO'),
+    (FakeDriver(markers=['#px-captcha']), 'CAPTCHA_DETECTADO'),
+])
+def test_check_blocked_detects_challenges(driver, code):
+    with pytest.raises(app.BlockedPageError) as error:
+        app.check_blocked(driver, URL)
+    assert error.value.code == code
+
+
+def test_check_blocked_uses_platform_signatures():
+    with pytest.raises(app.BlockedPageError):
+        app.check_blocked(FakeDriver(markers=['#captchacharacters']), 'https://www.amazon.com.mx/dp/B000')
+    app.check_blocked(FakeDriver(markers=['#captchacharacters']), URL)
+
+
+def test_check_blocked_ignores_recaptcha_widgets_on_normal_pages():
+    driver = FakeDriver(markers=['.g-recaptcha', 'iframe[src*="recaptcha"]', '#g-recaptcha-response'])
+    app.check_blocked(driver, URL)
+    app.check_blocked(driver, 'https://articulo.mercadolibre.com.mx/MLM-123456789-x')
+
+
+def test_blocked_page_is_recorded_as_captcha_and_not_cached(monkeypatch):
+    async def run_scrapers(*args, **kwargs):
+        raise app.BlockedPageError('liverpool', 'captcha', 'title: robot check')
+
+    monkeypatch.setattr(app, 'run_scrapers', run_scrapers)
+    platform_name, config = app.detect_platform(URL)
+    result = app.scrape_product(URL, platform_name, config)
+
+    assert result['error'] == 'CAPTCHA_DETECTADO'
+    assert result['blocked'] is True
+    assert app.rate_limiter.snapshot()['liverpool.com.mx']['captchas'] == 1
+    assert app.shared_store.get('scrape:' + hashlib.sha1(URL.encode()).hexdigest()) is None
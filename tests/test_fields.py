@@ -0,0 +1,112 @@
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+
+import app
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, ['name', 'price', 'image']),
+    ('', ['name', 'price', 'image']),
+    ([], ['name', 'price', 'image']),
+    ('price, name', ['name', 'price']),
+    (['image'], ['image']),
+])
+def test_parse_fields(value, expected):
+    assert app.parse_fields(value) == expected
+
+
+@pytest.mark.parametrize('value', [5, {'name': True}, False, ['name', 'stock'], ' , '])
+def test_parse_fields_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        app.parse_fields(value)
+
+
+def test_project_result_keeps_requested_fields_plus_currency_and_store():
+    result = {'name': 'Lámpara', 'price': 10.0, 'image': 'https://img', 'currency': 'MXN', 'store': 'Liverpool'}
+    assert app.project_result(result, ['price']) == {'price': 10.0, 'currency': 'MXN', 'store': 'Liverpool'}
+
+    error = {'error': 'RATE_LIMITED', 'message': '...'}
+    assert app.project_result(error, ['price']) == error
+
+
+class FakeBrowser:
+    """Driver mínimo para scrape_generic: meta tags por selector y registro de lecturas de page_source"""
+
+    title = 'Lámpara | Tienda'
+
+    def __init__(self, meta):
+        self.meta = meta
+        self.page_source_reads = 0
+
+    @property
+    def page_source(self):
+        self.page_source_reads += 1
+        return '<html></html>'
+
+    def get(self, url):
+        pass
+
+    def execute_script(self, script):
+        return 200
+
+    def find_element(self, by, selector):
+        if selector == 'body':
+            return FakeElement('')
+        if selector not in self.meta:
+            raise NoSuchElementException(selector)
+        return FakeElement(self.meta[selector])
+
+    def find_elements(self, by, selector):
+        return []
+
+
+class FakeElement:
+    text = ''
+
+    def __init__(self, content):
+        self.content = content
+
+    def get_attribute(self, name):
+        return self.content
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app.time, 'sleep', calls.append)
+    return calls
+
+
+META = {
+    'meta[property="og:title"]': 'Lámpara de mesa',
+    'meta[property="og:image"]': 'https://img/lampara.jpg',
+    'meta[property="product:price:amount"]': '1299',
+}
+
+
+@pytest.mark.parametrize('fields', [['image'], ['name'], ['name', 'image']])
+def test_meta_fields_skip_sleeps_and_page_source(sleeps, fields):
+    driver = FakeBrowser(META)
+    result = app.scrape_generic(driver, 'https://tienda.mx/p/1', {}, fields=fields)
+
+    assert sleeps == []
+    assert driver.page_source_reads == 0
+    expected = {'name': 'Lámpara de mesa', 'image': 'https://img/lampara.jpg'}
+    assert {field: result[field] for field in fields} == {field: expected[field] for field in fields}
+
+
+def test_meta_fast_path_falls_back_when_meta_is_missing(sleeps):
+    driver = FakeBrowser({})
+    result = app.scrape_generic(driver, 'https://tienda.mx/p/1', {}, fields=['image'])
+
+    assert sleeps == []
+    assert driver.page_source_reads == 1
+    assert result['image'] == ''
+
+
+def test_price_requests_keep_render_waits(sleeps):
+    driver = FakeBrowser(META)
+    result = app.scrape_generic(driver, 'https://tienda.mx/p/1', {}, fields=['name', 'price'])
+
+    assert sleeps == [3, 1]
+    assert result['price'] == 1299.0
@@ -0,0 +1,65 @@
+import argparse
+import random
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+import pytest
+
+import loadtest
+
+ARGS = SimpleNamespace(max_error_rate=0.01, max_failed_rate=0.02, p95_slo=20)
+
+
+def test_parse_mix_normalizes_weights():
+    assert loadtest.parse_mix('meta=3,next=1') == {'meta': 0.75, 'next': 0.25}
+
+
+@pytest.mark.parametrize('text', ['stock=1', 'meta=0,next=0'])
+def test_parse_mix_rejects_invalid_mixes(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        loadtest.parse_mix(text)
+
+
+@pytest.mark.parametrize('pct, expected', [(50, 50), (95, 95), (99, 99), (100, 100), (0, 1)])
+def test_percentile_nearest_rank(pct, expected):
+    assert loadtest.percentile(list(range(100, 0, -1)), pct) == expected
+
+
+def test_percentile_of_no_values():
+    assert loadtest.percentile([], 95) == 0.0
+
+
+def records(**outcomes):
+    result = []
+    for outcome, count in outcomes.items():
+        result += [{'endpoint': 'scrape', 'latency': 1.0, 'outcome': outcome} for _ in range(count)]
+    return result
+
+
+def test_summarize_sustainable_step():
+    step = loadtest.summarize(records(ok=95, blocked=5), 0, 10, 10, [], ARGS)
+    assert step['outcomes'] == {'ok': 95, 'blocked': 5, 'failed': 0, 'error': 0}
+    assert step['throughput_rps'] == 10
+    assert step['sustainable'] is True
+
+
+def test_summarize_counts_failed_responses_against_the_slo():
+    step = loadtest.summarize(records(ok=90, failed=10), 0, 10, 10, [], ARGS)
+    assert step['error_rate'] == 0
+    assert step['failed_rate'] == 0.1
+    assert step['by_endpoint']['scrape']['failed'] == 10
+    assert step['sustainable'] is False
+
+
+def test_summarize_flags_slow_or_short_steps():
+    slow = records(ok=100)
+    slow[-10:] = [{**r, 'latency': 30.0} for r in slow[-10:]]
+    assert loadtest.summarize(slow, 0, 10, 10, [], ARGS)['sustainable'] is False
+    assert loadtest.summarize(records(ok=50), 0, 10, 10, [], ARGS)['sustainable'] is False
+
+
+@pytest.mark.parametrize('kind, host', [('meta', 'localhost'), ('captcha', '127.0.0.2'), ('next', '127.0.0.1')])
+def test_page_kinds_get_their_own_host(kind, host):
+    url = loadtest.build_product_url('http://127.0.0.1:8765', random.Random(1), 0, {kind: 1})
+    assert urlparse(url).hostname == host
+    assert f'/store/{kind}/' in url
@@ -0,0 +1,95 @@
+import os
+import threading
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def template_dir(tmp_path, monkeypatch):
+    root = tmp_path / 'template'
+    monkeypatch.setattr(app, 'PROFILE_TEMPLATE_DIR', str(root))
+    return root
+
+
+def publish(marker):
+    """Publicar un perfil 'calentado' falso con un archivo de cache y los locks que deja Chrome"""
+    os.makedirs(app.profile_versions_dir(), exist_ok=True)
+    staging = app.tempfile.mkdtemp(prefix='.staging-', dir=app.profile_versions_dir())
+    os.makedirs(os.path.join(staging, 'Default', 'Cache'))
+    with open(os.path.join(staging, 'Default', 'Cache', 'data'), 'w') as f:
+        f.write(marker)
+    os.symlink('host-1234', os.path.join(staging, 'SingletonLock'))
+    open(os.path.join(staging, 'lockfile'), 'w').close()
+    return app.publish_profile_template(staging)
+
+
+def cached(clone):
+    with open(os.path.join(clone, 'Default', 'Cache', 'data')) as f:
+        return f.read()
+
+
+def test_no_template_yet(template_dir):
+    assert app.profile_template_age() is None
+    assert app.clone_profile_template() is None
+
+
+def test_clone_skips_chrome_lock_files(template_dir):
+    publish('v1')
+    clone = app.clone_profile_template()
+    try:
+        assert cached(clone) == 'v1'
+        assert not os.path.lexists(os.path.join(clone, 'SingletonLock'))
+        assert not os.path.lexists(os.path.join(clone, 'lockfile'))
+        assert app.profile_template_age() < 60
+    finally:
+        app.shutil.rmtree(clone)
+
+
+def test_clone_does_not_wait_for_the_profile_lock(template_dir):
+    publish('v1')
+    clones = []
+    with app._profile_lock:
+        worker = threading.Thread(target=lambda: clones.append(app.clone_profile_template()))
+        worker.start()
+        worker.join(5)
+    assert clones and cached(clones[0]) == 'v1'
+    app.shutil.rmtree(clones[0])
+
+
+def test_rebuilt_template_is_swapped_in(template_dir):
+    first = publish('v1')
+    before = app.clone_profile_template()
+    second = publish('v2')
+    after = app.clone_profile_template()
+    try:
+        assert cached(before) == 'v1'
+        assert cached(after) == 'v2'
+        assert os.readlink(template_dir / 'current') == os.path.join('versions', second)
+        # La versión anterior se conserva para clones en curso; las más viejas se borran
+        assert sorted(os.listdir(template_dir / 'versions')) == sorted([first, second])
+        third = publish('v3')
+        assert sorted(os.listdir(template_dir / 'versions')) == sorted([second, third])
+    finally:
+        app.shutil.rmtree(before)
+        app.shutil.rmtree(after)
+
+
+class FakeDriver:
+    def __init__(self, clone_dir):
+        self.profile_clone_dir = clone_dir
+        self.quits = 0
+
+    def quit(self):
+        self.quits += 1
+        raise app.WebDriverException('Chrome ya se había cerrado')
+
+
+def test_quit_driver_removes_the_clone_even_if_quit_fails(template_dir):
+    publish('v1')
+    driver = FakeDriver(app.clone_profile_template())
+    with pytest.raises(app.WebDriverException):
+        app.quit_driver(driver)
+    assert driver.quits == 1
+    assert not os.path.exists(driver.profile_clone_dir)
@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+from selenium.common.exceptions import SessionNotCreatedException, TimeoutException, WebDriverException
+
+import app
+
+
+def make_limiter(**overrides):
+    settings = {'rate': 2.0, 'burst': 2, 'min_rate': 0.1, 'max_wait': 5, 'max_backoff': 60}
+    settings.update(overrides)
+    return app.DomainRateLimiter(**settings)
+
+
+def test_acquire_uses_burst_then_waits_for_refill():
+    limiter = make_limiter()
+    assert asyncio.run(limiter.acquire('tienda.mx'))
+    assert asyncio.run(limiter.acquire('tienda.mx'))
+
+    start = time.monotonic()
+    assert asyncio.run(limiter.acquire('tienda.mx'))
+    assert time.monotonic() - start >= 0.3  # Un token tarda 0.5 s a 2 rps
+
+
+def test_acquire_gives_up_past_max_wait():
+    limiter = make_limiter(rate=0.1, burst=1)
+    assert asyncio.run(limiter.acquire('tienda.mx'))
+    assert not asyncio.run(limiter.acquire('tienda.mx', max_wait=0.2))
+
+
+def test_domains_are_independent():
+    limiter = make_limiter(burst=1)
+    assert asyncio.run(limiter.acquire('a.mx'))
+    assert asyncio.run(limiter.acquire('b.mx', max_wait=0))
+
+
+def test_captcha_halves_rate_and_backs_off():
+    limiter = make_limiter()
+    limiter.record('tienda.mx', 'captcha')
+    state = limiter.snapshot()['tienda.mx']
+    assert state['rate'] == 1.0
+    assert state['backoffSeconds'] == 0.5
+    assert state['backoffRemaining'] > 0
+    assert state['captchas'] == 1
+    assert not asyncio.run(limiter.acquire('tienda.mx', max_wait=0.1))
+
+    limiter.record('tienda.mx', 'captcha')
+    assert limiter.snapshot()['tienda.mx']['backoffSeconds'] == 1.0
+
+
+def test_error_slows_down_and_ok_recovers():
+    limiter = make_limiter()
+    limiter.record('tienda.mx', 'error')
+    assert limiter.snapshot()['tienda.mx']['rate'] == pytest.approx(1.6)
+
+    limiter.record('tienda.mx', 'ok')
+    state = limiter.snapshot()['tienda.mx']
+    assert state['rate'] == pytest.approx(1.8)
+    assert state['backoffSeconds'] == 0
+
+    for _ in range(5):
+        limiter.record('tienda.mx', 'ok')
+    assert limiter.snapshot()['tienda.mx']['rate'] == 2.0
+
+
+def test_merge_state_adopts_stricter_remote_state():
+    remote = make_limiter()
+    remote.record('tienda.mx', 'captcha')
+    shared = remote.export_state('tienda.mx')
+
+    local = make_limiter()
+    local.merge_state('tienda.mx', shared)
+    state = local.snapshot()['tienda.mx']
+    assert state['rate'] == 1.0
+    assert state['backoffRemaining'] > 0
+
+
+def test_merge_state_keeps_stricter_local_state():
+    local = make_limiter()
+    local.record('tienda.mx', 'captcha')
+    local.merge_state('tienda.mx', {'rate': 2.0, 'backoff': 0, 'backoff_until': 0})
+    assert local.snapshot()['tienda.mx']['rate'] == 1.0
+
+    local.merge_state('tienda.mx', None)
+    assert local.snapshot()['tienda.mx']['rate'] == 1.0
+
+
+@pytest.mark.parametrize('error, expected', [
+    (TimeoutException('page load'), True),
+    (WebDriverException('unknown error: net::ERR_CONNECTION_RESET'), True),
+    (aiohttp.ClientConnectionError(), True),
+    (WebDriverException('chrome not reachable'), False),
+    (SessionNotCreatedException('no chrome binary'), False),
+    (RuntimeError('bug del extractor'), False),
+])
+def test_is_store_failure(error, expected):
+    assert app.is_store_failure(error) is expected
+
+
+URL = 'https://www.liverpool.com.mx/tienda/pdp/lampara/1234'
+
+
+def failing_scrapers(error):
+    async def run_scrapers(*args, **kwargs):
+        raise error
+    return run_scrapers
+
+
+def scrape():
+    platform_name, config = app.detect_platform(URL)
+    return app.scrape_product(URL, platform_name, config)
+
+
+def test_local_browser_failure_is_not_a_store_error(monkeypatch):
+    monkeypatch.setattr(app, 'run_scrapers', failing_scrapers(SessionNotCreatedException('no chrome')))
+    with pytest.raises(SessionNotCreatedException):
+        scrape()
+    assert app.rate_limiter.snapshot()['liverpool.com.mx']['errors'] == 0
+
+
+def test_store_timeout_is_a_store_error(monkeypatch):
+    monkeypatch.setattr(app, 'run_scrapers', failing_scrapers(TimeoutException('page load')))
+    with pytest.raises(TimeoutException):
+        scrape()
+    assert app.rate_limiter.snapshot()['liverpool.com.mx']['errors'] == 1
+
+
+def test_debug_route_waits_for_a_token_and_records_outcome(monkeypatch):
+    screenshots = []
+
+    def run_debug_browser(url):
+        screenshots.append(url)
+        return {'screenshot': 'data:image/png;base64,', 'debug': {}}
+
+    monkeypatch.setattr(app, 'run_debug_browser', run_debug_browser)
+    response = app.app.test_client().post('/api/debug', json={'url': URL})
+    assert response.get_json()['success'] is True
+    assert screenshots == [URL]
+    assert app.rate_limiter.snapshot()['liverpool.com.mx']['requests'] == 1
+
+
+def test_debug_route_gives_up_when_the_domain_is_saturated(monkeypatch):
+    monkeypatch.setattr(app, 'rate_limiter', make_limiter(rate=0.01, burst=1, max_wait=0))
+    monkeypatch.setattr(app, 'run_debug_browser', lambda url: {'screenshot': '', 'debug': {}})
+    client = app.app.test_client()
+    assert client.post('/api/debug', json={'url': URL}).get_json()['success'] is True
+    assert client.post('/api/debug', json={'url': URL}).get_json()['error'] == 'RATE_LIMITED'
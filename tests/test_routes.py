@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+
+
+def test_stream_scrape_returns_ndjson_events(client, stub_base):
+    url = f'{stub_base}/store/next/lampara'
+    response = client.post('/api/scrape', json={'url': url, 'stream': True, 'fields': ['name', 'price']})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    events = [event for event in ndjson(response) if event['event'] != 'ping']
+
+    fields = {event['field']: event for event in events if event['event'] == 'field'}
+    assert fields['name']['value'] == 'Producto lampara'
+    assert fields['price']['value'] == 499.0
+    assert fields['price']['source'] == 'api'
+    assert fields['price']['provisional'] is False
+
+    final = events[-1]
+    assert final['event'] == 'final'
+    assert final['success'] is True
+    assert final['data']['name'] == 'Producto lampara'
+    assert 'image' not in final['data']
+
+
+def test_stream_via_accept_header(client, stub_base):
+    response = client.post('/api/scrape', json={'url': f'{stub_base}/store/preloaded/silla'},
+                           headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    assert ndjson(response)[-1]['data']['name'] == 'Producto silla'
+
+
+def test_stream_reports_block_in_final_event(client, stub_base, monkeypatch):
+    def browser(url, platform_name, platform_config, progress=None, fields=None):
+        raise app.BlockedPageError(platform_name, 'captcha', 'title: robot check')
+
+    monkeypatch.setattr(app, 'run_browser_scraper', browser)
+    response = client.post('/api/scrape', json={'url': f'{stub_base}/store/captcha/lampara', 'stream': True})
+    final = ndjson(response)[-1]
+    assert final['event'] == 'final'
+    assert final['success'] is False
+    assert final['error'] == 'CAPTCHA_DETECTADO'
+    assert final['blocked'] is True
+
+
+class FakeDriver:
+    quits = 0
+
+    def quit(self):
+        self.quits += 1
+
+
+def test_cancel_closes_attached_driver_once():
+    progress = app.ScrapeProgress(['name'])
+    driver = FakeDriver()
+    progress.attach_driver(driver)
+    progress.cancel()
+
+    assert driver.quits == 1
+    assert progress.detach_driver() is False
+    with pytest.raises(app.ScrapeCancelled):
+        progress.report({'name': 'Lámpara'}, 'meta')
+
+
+def test_stream_flag_must_be_boolean(client, stub_base):
+    response = client.post('/api/scrape', json={'url': f'{stub_base}/store/next/lampara', 'stream': 'false'})
+    assert response.mimetype == 'application/json'
+    assert response.get_json()['success'] is True
+
+
+def test_invalid_fields_return_400(client):
+    response = client.post('/api/scrape', json={'url': 'https://tienda.mx/p/1', 'fields': 5})
+    assert response.status_code == 400
+    assert 'fields' in response.get_json()['error']
+
+    response = client.post('/api/scrape', json={'url': 'https://tienda.mx/p/1', 'fields': ['stock']})
+    assert response.status_code == 400
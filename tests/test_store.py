@@ -0,0 +1,178 @@
+import time
+
+import pytest
+
+import app
+
+URL = 'https://www.liverpool.com.mx/tienda/pdp/lampara/1234'
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return app.MemoryStore()
+    return app.SQLiteStore(str(tmp_path / 'cache.db'))
+
+
+def stored_keys(store):
+    if isinstance(store, app.MemoryStore):
+        return len(store._data)
+    return store._conn.execute('SELECT COUNT(*) FROM kv').fetchone()[0]
+
+
+def test_values_expire_after_ttl(store):
+    store.set_json('scrape:a', {'name': 'A'}, 60)
+    store.set('scrape:b', 'B', 0.05)
+    assert store.get_json('scrape:a') == {'name': 'A'}
+    assert store.get('scrape:b') == 'B'
+
+    time.sleep(0.1)
+    assert store.get('scrape:b') is None
+    assert store.get_json('scrape:a') == {'name': 'A'}
+
+
+def test_lock_has_a_single_owner(store):
+    token = store.acquire_lock('lock:a', 60)
+    assert token
+    assert store.acquire_lock('lock:a', 60) is None
+
+    store.release_lock('lock:a', 'otro-token')
+    assert store.acquire_lock('lock:a', 60) is None
+
+    store.release_lock('lock:a', token)
+    assert store.acquire_lock('lock:a', 60)
+
+
+def test_expired_lock_can_be_taken_over(store):
+    assert store.acquire_lock('lock:a', 0.05)
+    time.sleep(0.1)
+    assert store.acquire_lock('lock:a', 60)
+
+
+def test_periodic_sweep_drops_expired_keys(store, monkeypatch):
+    monkeypatch.setattr(store, 'SWEEP_EVERY', 10)
+    for i in range(9):
+        store.set(f'scrape:{i}', 'x', 0.01)
+    time.sleep(0.05)
+    store.set('scrape:vigente', 'x', 60)
+
+    assert stored_keys(store) == 1
+    assert store.get('scrape:vigente') == 'x'
+
+
+def test_backends_must_implement_the_interface():
+    with pytest.raises(TypeError):
+        app.SharedStore()
+
+    class Incomplete(app.SharedStore):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+class FakeRedis:
+    """Cliente Redis en memoria con la semántica de SET EX/PX/NX y el script de liberación"""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = []
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        self.calls.append(('set', key, ex, px, nx))
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def eval(self, script, numkeys, key, token):
+        assert script == app.RedisStore.RELEASE_SCRIPT
+        if self.data.get(key) == token:
+            del self.data[key]
+            return 1
+        return 0
+
+
+@pytest.fixture
+def redis_store(monkeypatch):
+    redis = pytest.importorskip('redis')
+    client = FakeRedis()
+    options = {}
+
+    def from_url(url, **kwargs):
+        options.update(kwargs, url=url)
+        return client
+
+    monkeypatch.setattr(redis.Redis, 'from_url', staticmethod(from_url))
+    store = app.create_store('redis://cache.internal:6379/0')
+    return store, client, options
+
+
+def test_redis_store_uses_native_ttl_and_locks(redis_store):
+    store, client, options = redis_store
+    assert isinstance(store, app.RedisStore)
+    assert options['url'] == 'redis://cache.internal:6379/0'
+    assert options['decode_responses'] is True
+
+    store.set_json('scrape:a', {'name': 'A'}, 0.2)
+    assert store.get_json('scrape:a') == {'name': 'A'}
+    assert client.calls[-1] == ('set', 'scrape:a', 1, None, False)
+
+    token = store.acquire_lock('lock:a', 1.5)
+    assert client.calls[-1] == ('set', 'lock:a', None, 1500, True)
+    assert store.acquire_lock('lock:a', 60) is None
+
+    store.release_lock('lock:a', 'otro-token')
+    assert client.get('lock:a') == token
+    store.release_lock('lock:a', token)
+    assert store.acquire_lock('lock:a', 60)
+
+
+def test_create_store_picks_backend(tmp_path):
+    assert isinstance(app.create_store('memory://'), app.MemoryStore)
+    assert isinstance(app.create_store(f'sqlite:///{tmp_path}/cache.db'), app.SQLiteStore)
+
+
+@pytest.fixture
+def fake_scrapers(monkeypatch):
+    """Reemplazar las fuentes (API + navegador) por un resultado fijo y contar las llamadas"""
+    calls = []
+
+    async def run_scrapers(url, platform_name, platform_config, progress=None, fields=None):
+        fields = fields or app.SCRAPE_FIELDS
+        calls.append(list(fields))
+        return {
+            'name': 'Lámpara',
+            'price': 10.0,
+            'image': 'https://img/lampara.jpg' if 'image' in fields else '',
+            'currency': 'MXN',
+            'store': 'Liverpool'
+        }
+
+    monkeypatch.setattr(app, 'run_scrapers', run_scrapers)
+    return calls
+
+
+def scrape(fields=None):
+    platform_name, config = app.detect_platform(URL)
+    return app.scrape_product(URL, platform_name, config, fields)
+
+
+def test_cache_hit_for_already_attempted_fields(fake_scrapers):
+    scrape()
+    assert scrape(['name', 'price'])['price'] == 10.0
+    assert fake_scrapers == [['name', 'price', 'image']]
+
+
+def test_quick_scrape_does_not_satisfy_full_scrape(fake_scrapers):
+    scrape(['name', 'price'])
+    assert scrape()['image'] == 'https://img/lampara.jpg'
+    assert fake_scrapers == [['name', 'price'], ['name', 'price', 'image']]
+
+    # Ya se intentaron los tres campos: ahora sí es hit
+    assert scrape(['image'])['image'] == 'https://img/lampara.jpg'
+    assert len(fake_scrapers) == 2
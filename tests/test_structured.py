@@ -0,0 +1,175 @@
+import json
+
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+
+import app
+import stub_server
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://articulo.mercadolibre.com.mx/MLM-123456789-audifonos-_JM', 'MLM123456789'),
+    ('https://www.mercadolibre.com.mx/audifonos/p/MLM987654321', None),
+    ('https://www.mercadolibre.com.mx/audifonos/p/MLM987654321?item_id=MLM-555666777', 'MLM555666777'),
+    ('https://www.mercadolibre.com.mx/audifonos/p/MLM987654321?wid=mlm111222333', 'MLM111222333'),
+    ('https://www.mercadolibre.com.mx/ofertas', None),
+])
+def test_extract_mercadolibre_item_id(url, expected):
+    assert app.extract_mercadolibre_item_id(url) == expected
+
+
+@pytest.mark.parametrize('kind', ['next', 'preloaded'])
+def test_embedded_state_from_stub_pages(kind):
+    states = app.extract_embedded_state(stub_server.render_store_page(kind, 'audifonos'))
+    assert len(states) == 1
+
+    product = app.find_product_in_state(states[0])
+    assert product['name'] == 'Producto audifonos'
+    assert product['price'] == 499.0
+    assert product['image'] == 'https://stub.local/img/audifonos.jpg'
+
+
+def test_meta_page_has_no_embedded_state():
+    assert app.extract_embedded_state(stub_server.render_store_page('meta', 'audifonos')) == []
+
+
+def test_state_ignores_breadcrumbs_and_related_products():
+    state = {
+        'breadcrumb': [{'title': 'Electrónica', 'price': 10}],
+        'related': [{'id': 7, 'name': 'Otro producto', 'listPrice': 50}],
+        'detail': {'sku': 'A1', 'name': 'Producto principal', 'listPrice': 200, 'salePrice': 150},
+    }
+    product = app.find_product_in_state(state)
+    assert product['name'] == 'Producto principal'
+    assert product['price'] == 150.0
+
+
+def test_state_prefers_known_product_path():
+    state = {'props': {'pageProps': {
+        'carousel': [{'id': 1, 'name': 'Recomendado', 'price': 99}],
+        'product': {'productName': 'Principal', 'price': {'amount': 1299}},
+    }}}
+    assert app.find_product_in_state(state)['name'] == 'Principal'
+
+
+def test_state_list_price_only_as_fallback():
+    state = {'items': [{'id': 1, 'name': 'Solo lista', 'listPrice': 50}]}
+    assert app.find_product_in_state(state)['price'] == 50.0
+
+
+def structured(url):
+    platform_name, config = app.detect_platform(url)
+    return app.run_async(app.fetch_structured_product(url, platform_name, config))
+
+
+def test_structured_tier_reads_stub_state(stub_base):
+    result = structured(f'{stub_base}/store/next/lampara')
+    assert result['name'] == 'Producto lampara'
+    assert result['price'] == 499.0
+    assert result['currency'] == 'MXN'
+
+
+def test_structured_tier_remembers_domains_without_state(stub_base):
+    assert structured(f'{stub_base}/store/meta/lampara') is None
+    assert app.shared_store.get('httpstate:' + app.get_domain(stub_base)) == 'no'
+
+
+@pytest.mark.parametrize('kind', ['captcha', 'blocked'])
+def test_raw_block_falls_through_to_browser(stub_base, monkeypatch, kind):
+    opened = []
+
+    def browser(url, platform_name, platform_config, progress=None, fields=None):
+        opened.append(url)
+        return {'name': 'Desde Chrome', 'price': 10.0, 'image': '', 'currency': 'MXN', 'store': 'Tienda'}
+
+    monkeypatch.setattr(app, 'run_browser_scraper', browser)
+    url = f'{stub_base}/store/{kind}/lampara'
+    platform_name, config = app.detect_platform(url)
+    result = app.scrape_product(url, platform_name, config)
+
+    assert result['name'] == 'Desde Chrome'
+    assert opened == [url]
+    assert app.shared_store.get('httpstate:' + app.get_domain(url)) == 'no'
+    assert app.rate_limiter.snapshot()[app.get_domain(url)]['captchas'] == 0
+
+
+def test_browser_block_is_still_reported(stub_base, monkeypatch):
+    def browser(url, platform_name, platform_config, progress=None, fields=None):
+        raise app.BlockedPageError(platform_name, 'block', 'status: 403')
+
+    monkeypatch.setattr(app, 'run_browser_scraper', browser)
+    url = f'{stub_base}/store/blocked/lampara'
+    platform_name, config = app.detect_platform(url)
+    result = app.scrape_product(url, platform_name, config)
+
+    assert result['error'] == 'BLOQUEO_DETECTADO'
+    assert app.rate_limiter.snapshot()[app.get_domain(url)]['captchas'] == 1
+
+
+def test_mercadolibre_api_via_stub(stub_base, monkeypatch):
+    monkeypatch.setattr(app, 'MELI_API_BASE', f'{stub_base}/meli')
+    result = structured('https://articulo.mercadolibre.com.mx/MLM-123456789-audifonos-_JM')
+    assert result['name'] == 'Audífonos Inalámbricos Stub'
+    assert result['price'] == 1299.5
+    assert result['image'] == 'https://http2.mlstatic.com/D_stub-O.jpg'
+
+
+class FakePage:
+    """Driver mínimo para universal_extract: HTML fuente y meta tags por selector"""
+
+    def __init__(self, state, meta=None, title='Tienda'):
+        self.page_source = f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(state)}</script>'
+        self.meta = meta or {}
+        self.title = title
+
+    def find_element(self, by, selector):
+        if selector not in self.meta:
+            raise NoSuchElementException(selector)
+        return FakeElement(self.meta[selector])
+
+    def find_elements(self, by, selector):
+        return []
+
+
+class FakeElement:
+    text = ''
+
+    def __init__(self, content):
+        self.content = content
+
+    def get_attribute(self, name):
+        return self.content
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(app.time, 'sleep', lambda seconds: None)
+
+
+META = {
+    'meta[property="og:title"]': 'Lámpara de mesa',
+    'meta[property="product:price:amount"]': '1299',
+    'meta[property="og:image"]': 'https://img/lampara.jpg',
+}
+
+
+def test_browser_state_guess_does_not_beat_meta_tags(no_sleep):
+    state = {'props': {'pageProps': {'carousel': [{'id': 1, 'name': 'Recomendado', 'price': 99}]}}}
+    result = app.universal_extract(FakePage(state, META), 'https://tienda.mx/p/1', {})
+    assert result['name'] == 'Lámpara de mesa'
+    assert result['price'] == 1299.0
+
+
+def test_browser_known_state_path_wins(no_sleep):
+    state = {'props': {'pageProps': {'product': {'name': 'Principal', 'price': 500}}}}
+    result = app.universal_extract(FakePage(state, META), 'https://tienda.mx/p/1', {})
+    assert result['name'] == 'Principal'
+    assert result['price'] == 500.0
+    assert result['image'] == 'https://img/lampara.jpg'
+
+
+def test_browser_state_guess_fills_what_meta_lacks(no_sleep):
+    state = {'data': {'item': {'sku': 'A1', 'name': 'Sin meta tags', 'salePrice': 250}}}
+    result = app.universal_extract(FakePage(state), 'https://tienda.mx/p/1', {})
+    assert result['name'] == 'Sin meta tags'
+    assert result['price'] == 250.0